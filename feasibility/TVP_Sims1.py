@@ -0,0 +1,115 @@
+# -*- coding: utf-8 -*-
+"""
+##################################################
+#
+# Identification and Estimation in Judicial Panel Voting
+#
+# Lealand Morin, Ph.D.
+# Assistant Professor
+# Department of Economics
+# College of Business
+# University of Central Florida
+#
+# May 29, 2021
+#
+##################################################
+#
+# TVP_Sims performs simulations of the estimation of parameters
+#   in of a trivariate probit model.
+#   It is part of the code base to accompany
+#   the manuscript "Diversity Effects or Dissent Aversion?
+#   Identification and Estimation in Judicial Panel Voting"
+#   by Cameron, Morin and Paarsch
+#
+# This first version translates the simulation in MVTnorm_Sims5.R
+# and runs the replications in parallel, appending each result
+# to a file as it is completed, so that an interrupted
+# simulation resumes where it stopped.
+#
+# Dependencies:
+#   tvprobit.py
+#
+#
+##################################################
+"""
+
+##################################################
+# Import Modules
+##################################################
+
+import os
+
+import numpy as np
+
+import tvprobit as tvp
+
+
+##################################################
+# Set Parameters for Simulation
+##################################################
+
+# Number of replications for simulation of estimation.
+num_reps = 100
+
+# Number of times each combination of judges appears on the panel.
+n_cycles = 3
+
+# Specify a dataset for the characteristics of judges.
+num_judges = 5
+rng = np.random.default_rng(42)
+x_judge = rng.choice([0.0, 1.0], size = (num_judges, 2))
+
+# 5 choose 3 is 60 distinct judiciary panels,
+# so 180 cases, in total.
+
+
+# Average intents of three appeals court judges.
+alpha_0 = 0.25
+
+# Slope coefficients on covariates for own characteristics, common to all judges.
+beta_0 = [1, 2]
+
+# Slope coefficients on covariates for peer effects, common to all judges.
+gamma_0 = [-0.5, -1]
+
+# Dissent aversion parameter.
+delta_0 = 0.1
+
+# Design of Sigma depends on the chosen model.
+# model_name = 'mu_only'
+# param_0 = [1, 0, -1]
+
+# model_name = 'cov_const'
+# param_0 = [alpha_0] + beta_0 + [0.5]
+
+# model_name = 'peer_fx'
+# param_0 = [alpha_0] + beta_0 + gamma_0
+
+model_name = 'dis_aversn'
+param_0 = [alpha_0] + beta_0 + gamma_0 + [delta_0]
+
+
+# Results are appended to this file, one replication per line.
+results_file = os.path.join('results', 'TVP_Sims1_%s.csv' % model_name)
+
+
+##################################################
+# Perform Simulation
+##################################################
+
+# The replications run in worker processes,
+# which import this script on some platforms,
+# so the simulation runs only when this is the main script.
+if __name__ == '__main__':
+    
+    os.makedirs(os.path.dirname(results_file), exist_ok = True)
+    
+    estn_results = tvp.run_tvp_sims(param_0, model_name, x_judge, n_cycles, 
+                                    num_reps, results_file, seed = 42)
+    
+    print(estn_results.describe())
+
+
+##################################################
+# End
+##################################################
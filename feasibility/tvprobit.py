@@ -0,0 +1,937 @@
+# -*- coding: utf-8 -*-
+"""
+##################################################
+#
+# Identification and Estimation in Judicial Panel Voting
+# The tvprobit Module
+#
+# Lealand Morin, Ph.D.
+# Assistant Professor
+# Department of Economics
+# College of Business
+# University of Central Florida
+#
+# May 29, 2021
+#
+##################################################
+#
+# Identification and Estimation in Judicial Panel Voting
+# Functions for Estimation of the Trivariate Probit Model
+# of Votes on Judicial Panels
+#
+# This script is a module of function definitions,
+# translated from the functions in MVTnorm_Sims5.R.
+# The likelihood is calculated for all cases at once,
+# with arrays of mean vectors and a batched calculation
+# of the trivariate normal orthant probabilities,
+# in place of a call to pmvnorm for each case.
+#
+##################################################
+"""
+
+##################################################
+# Import Modules.
+##################################################
+
+import os
+import csv
+import warnings
+import concurrent.futures
+
+import numpy as np
+import pandas as pd
+import scipy.optimize
+import scipy.special
+
+
+##################################################
+# Define functions for the bivariate and trivariate normal distributions.
+##################################################
+
+# Gauss-Legendre nodes and weights on [0, 1],
+# for the integrals in the bivariate and trivariate normal distributions,
+# with more nodes for larger correlations, as in Genz (2004).
+GL_RULES = [(0.3, 6), (0.6, 12), (1.0, 20)]
+GL_NODES_01 = {}
+GL_WEIGHTS_01 = {}
+for (gl_r_max, gl_num_nodes) in GL_RULES:
+    (gl_nodes, gl_weights) = np.polynomial.legendre.leggauss(gl_num_nodes)
+    GL_NODES_01[gl_num_nodes] = (gl_nodes + 1)/2
+    GL_WEIGHTS_01[gl_num_nodes] = gl_weights/2
+
+# Orderings of the three variables that put
+# each of the pairs (1, 2), (1, 3) and (2, 3) first,
+# and the corresponding orderings of the correlations r_21, r_31 and r_32.
+TVN_PERMS = np.array([[0, 1, 2], [0, 2, 1], [1, 2, 0]])
+TVN_CORR_PERMS = np.array([[0, 1, 2], [1, 0, 2], [2, 0, 1]])
+
+# Pairs of variables for the correlations r_21, r_31 and r_32.
+TVN_PAIRS = [(1, 0), (2, 0), (2, 1)]
+
+# For the derivatives with respect to each variable k, 
+# the other two variables (a, b) and the positions of r_ak, r_bk and r_ab.
+TVN_DERIV_INDEX = [(0, (1, 2), (0, 1, 2)), 
+                   (1, (0, 2), (0, 2, 1)), 
+                   (2, (0, 1), (1, 2, 0))]
+
+
+# Get the number of Gauss-Legendre nodes for correlations up to r_abs_max.
+def get_gl_num_nodes(r_abs_max):
+    
+    for (gl_r_max, gl_num_nodes) in GL_RULES:
+        if r_abs_max < gl_r_max:
+            return(gl_num_nodes)
+    
+    return(GL_RULES[-1][1])
+
+
+# Calculate the bivariate normal density at (h, k) with correlation r.
+def bvn_pdf(h, k, r):
+    
+    one_m_r2 = 1 - r*r
+    bvn_dens = np.exp(-(h*h - 2*r*h*k + k*k)/(2*one_m_r2))/(2*np.pi*np.sqrt(one_m_r2))
+    
+    return(bvn_dens)
+
+
+# Calculate the bivariate normal CDF P(X < h, Y < k), with correlation r,
+# for arrays of limits and correlations.
+def bvn_cdf(h, k, r):
+    
+    # This is the algorithm of Drezner and Wesolowsky (1990),
+    # as modified by Genz (2004), which calculates the upper probability P(X > -h, Y > -k).
+    # Examples:
+    # bvn_cdf(0, 0, 0.5)
+    # 0.33333333333333337
+    
+    (h, k, r) = np.broadcast_arrays(-np.asarray(h, dtype = float),
+                                    -np.asarray(k, dtype = float),
+                                    np.asarray(r, dtype = float))
+    bvn = np.zeros(h.shape)
+    
+    # For moderate correlations, integrate over the arcsine of the correlation.
+    is_mod = np.abs(r) < 0.925
+    if np.any(is_mod):
+        (h_m, k_m, r_m) = (h[is_mod], k[is_mod], r[is_mod])
+        hk = (h_m*k_m)[..., None]
+        hs = ((h_m*h_m + k_m*k_m)/2)[..., None]
+        # The sines are calculated once for each distinct correlation.
+        (r_unique, r_index) = np.unique(r_m, return_inverse = True)
+        num_nodes = get_gl_num_nodes(np.max(np.abs(r_unique)))
+        asr = np.arcsin(r_m)
+        sn = np.sin(np.arcsin(r_unique)[:, None]*GL_NODES_01[num_nodes])[r_index]
+        bvn_int = np.sum(GL_WEIGHTS_01[num_nodes]*np.exp((sn*hk - hs)/(1 - sn*sn)), axis = -1)
+        bvn[is_mod] = (bvn_int*asr/(2*np.pi)
+                       + scipy.special.ndtr(-h_m)*scipy.special.ndtr(-k_m))
+    
+    # For high correlations, integrate over the distance from perfect correlation.
+    is_high = ~is_mod
+    if np.any(is_high):
+        (h_h, k_h, r_h) = (h[is_high], k[is_high], r[is_high])
+        k_h = np.where(r_h < 0, -k_h, k_h)
+        hk = h_h*k_h
+        bvn_h = np.zeros(h_h.shape)
+        is_part = np.abs(r_h) < 1
+        if np.any(is_part):
+            (h_p, k_p, hk_p) = (h_h[is_part], k_h[is_part], hk[is_part])
+            r_p = r_h[is_part]
+            a_s = (1 - r_p)*(1 + r_p)
+            a = np.sqrt(a_s)
+            b_s = (h_p - k_p)**2
+            c = (4 - hk_p)/8
+            d = (12 - hk_p)/16
+            bvn_p = a*np.exp(-(b_s/a_s + hk_p)/2)*(1 - c*(b_s - a_s)*(1 - d*b_s/5)/3
+                                                    + c*d*a_s*a_s/5)
+            b = np.sqrt(b_s)
+            bvn_p = bvn_p - np.where(hk_p > -160,
+                                     np.exp(-np.maximum(hk_p, -160)/2)*np.sqrt(2*np.pi)
+                                     *scipy.special.ndtr(-b/a)*b*(1 - c*b_s*(1 - d*b_s/5)/3),
+                                     0)
+            x_s = (a[..., None]*GL_NODES_01[20])**2
+            r_s = np.sqrt(1 - x_s)
+            (b_s, c, d, hk_p) = (b_s[..., None], c[..., None], d[..., None], hk_p[..., None])
+            bvn_int = np.exp(-(b_s/x_s + hk_p)/2)*(np.exp(-hk_p*(1 - r_s)/(2*(1 + r_s)))/r_s
+                                                   - (1 + c*x_s*(1 + d*x_s)))
+            bvn_p = bvn_p + a*np.sum(GL_WEIGHTS_01[20]*bvn_int, axis = -1)
+            bvn_h[is_part] = -bvn_p/(2*np.pi)
+        bvn_h = np.where(r_h > 0,
+                         bvn_h + scipy.special.ndtr(-np.maximum(h_h, k_h)),
+                         -bvn_h + np.maximum(0, scipy.special.ndtr(-h_h)
+                                             - scipy.special.ndtr(-k_h)))
+        bvn[is_high] = bvn_h
+    
+    return(bvn)
+
+
+# Calculate the trivariate normal CDF P(X_1 < h_1, X_2 < h_2, X_3 < h_3)
+# for an array of limits h, with a row for each case,
+# and correlations r, with columns for r_21, r_31 and r_32.
+def tvn_cdf(h, r):
+    
+    # The pair with the largest correlation is kept,
+    # and the others are reduced from zero to their values
+    # along a path of correlation matrices, as in Genz (2004).
+    # At zero, the probability is a bivariate times a univariate CDF,
+    # and the change along the path is the integral of
+    # the derivatives of the CDF with respect to the correlations,
+    # which are bivariate densities times univariate CDFs.
+    # Examples:
+    # tvn_cdf(np.zeros((1, 3)), np.full((1, 3), 0.5))
+    # array([0.25])
+    
+    h = np.asarray(h, dtype = float)
+    r = np.asarray(r, dtype = float)
+    
+    # Reorder the variables so that the largest correlation is r_21.
+    perm_num = np.argmax(np.abs(r), axis = 1)
+    h = np.take_along_axis(h, TVN_PERMS[perm_num], axis = 1)
+    r = np.take_along_axis(r, TVN_CORR_PERMS[perm_num], axis = 1)
+    (r_21, r_31, r_32) = (r[:, 0], r[:, 1], r[:, 2])
+    
+    # Probability with r_31 and r_32 at zero.
+    tvn = bvn_cdf(h[:, 0], h[:, 1], r_21)*scipy.special.ndtr(h[:, 2])
+    
+    # Integrate the derivatives along the path t*r_31, t*r_32, for t in [0, 1].
+    (h_1, h_2, h_3) = (h[:, 0:1], h[:, 1:2], h[:, 2:3])
+    (r_21, r_31, r_32) = (r_21[:, None], r_31[:, None], r_32[:, None])
+    num_nodes = get_gl_num_nodes(max(np.max(np.abs(r_31), initial = 0), 
+                                     np.max(np.abs(r_32), initial = 0)))
+    (t_31, t_32) = (r_31*GL_NODES_01[num_nodes], r_32*GL_NODES_01[num_nodes])
+    tvn_int = (r_31*bvn_pdf(h_1, h_3, t_31)*get_cond_cdf(h_2, h_1, h_3, r_21, t_32, t_31)
+               + r_32*bvn_pdf(h_2, h_3, t_32)*get_cond_cdf(h_1, h_2, h_3, r_21, t_31, t_32))
+    tvn = tvn + np.sum(GL_WEIGHTS_01[num_nodes]*tvn_int, axis = -1)
+    
+    return(np.clip(tvn, 0, 1))
+
+
+# Calculate the conditional normal CDF P(X_l < h_l | X_j = h_j, X_k = h_k),
+# given the correlations r_lj, r_lk and r_jk.
+def get_cond_cdf(h_l, h_j, h_k, r_lj, r_lk, r_jk):
+    
+    one_m_r2 = 1 - r_jk*r_jk
+    cond_mean = ((r_lj - r_lk*r_jk)*h_j + (r_lk - r_lj*r_jk)*h_k)/one_m_r2
+    cond_var = (1 - r_lj*r_lj - r_lk*r_lk - r_jk*r_jk + 2*r_lj*r_lk*r_jk)/one_m_r2
+    
+    return(scipy.special.ndtr((h_l - cond_mean)/np.sqrt(cond_var)))
+
+
+# Calculate the probabilities of the votes y, an array of booleans,
+# given the means mu of the latent intents and the covariance matrix Sigma.
+def tvn_orthant_prob(y, mu, Sigma):
+    
+    # Each probability is P(nu_k > 0 for y_k, nu_k < 0 otherwise),
+    # which is the CDF of the signed latent intents at the signed,
+    # standardized means, with correlations of the same signs.
+    # Examples:
+    # tvn_orthant_prob(np.array([[True, True, False]]), np.zeros((1, 3)), np.eye(3))
+    # array([0.125])
+    
+    (sign, sd, h, r) = get_orthant_limits(y, mu, Sigma)
+    
+    return(tvn_cdf(h, r))
+
+
+# Get the signs of the votes y, the standard deviations in Sigma, 
+# and the standardized limits and correlations of the orthant probabilities.
+def get_orthant_limits(y, mu, Sigma):
+    
+    sign = np.where(np.asarray(y, dtype = bool), 1.0, -1.0)
+    sd = np.sqrt(np.diag(Sigma))
+    h = sign*np.asarray(mu, dtype = float)/sd
+    r = np.column_stack([sign[:, j]*sign[:, k]*Sigma[j, k]/(sd[j]*sd[k]) 
+                         for (j, k) in TVN_PAIRS])
+    
+    return((sign, sd, h, r))
+
+
+# Calculate the derivatives of the trivariate normal CDF 
+# with respect to the limits h and the correlations r_21, r_31 and r_32.
+def tvn_cdf_deriv(h, r):
+    
+    # The derivative with respect to h_k is the density of X_k 
+    # times the conditional bivariate CDF of the other two, 
+    # and the derivative with respect to r_jk is the bivariate density 
+    # of X_j and X_k times the conditional CDF of the third.
+    
+    h = np.asarray(h, dtype = float)
+    r = np.asarray(r, dtype = float)
+    d_h = np.empty(h.shape)
+    d_r = np.empty(r.shape)
+    for (k, (a, b), (r_ak, r_bk, r_ab)) in TVN_DERIV_INDEX:
+        (s_ak, s_bk) = (np.sqrt(1 - r[:, r_ak]**2), np.sqrt(1 - r[:, r_bk]**2))
+        d_h[:, k] = (np.exp(-h[:, k]**2/2)/np.sqrt(2*np.pi)
+                     *bvn_cdf((h[:, a] - r[:, r_ak]*h[:, k])/s_ak, 
+                              (h[:, b] - r[:, r_bk]*h[:, k])/s_bk, 
+                              (r[:, r_ab] - r[:, r_ak]*r[:, r_bk])/(s_ak*s_bk)))
+        # The pair (a, b) is the pair without k.
+        d_r[:, r_ab] = (bvn_pdf(h[:, a], h[:, b], r[:, r_ab])
+                        *get_cond_cdf(h[:, k], h[:, a], h[:, b], r[:, r_ak], r[:, r_bk], r[:, r_ab]))
+    
+    return((d_h, d_r))
+
+
+# Calculate the log-likelihood of the votes y, given the means mu 
+# and the covariance matrix Sigma, with its derivatives 
+# with respect to mu and each element of Sigma.
+def tvn_orthant_loglike_grad(y, mu, Sigma, weights = None):
+    
+    # The derivatives with respect to Sigma are divided equally between 
+    # the elements above and below the diagonal, 
+    # so the change in the log-likelihood is the sum of the derivatives 
+    # times the changes in all elements of Sigma.
+    
+    (sign, sd, h, r) = get_orthant_limits(y, mu, Sigma)
+    tiny = np.finfo(float).tiny
+    prob = np.maximum(tvn_cdf(h, r), tiny)
+    if weights is None:
+        weights = np.ones(prob.shape)
+    loglike = np.dot(weights, np.log(prob))
+    
+    # Chain the derivatives of the log probabilities through h and r.
+    # The derivatives are divided by the probabilities before the weights 
+    # are applied, since weights/prob overflows for small probabilities.
+    # The log-likelihood is flat where the probability is floored at tiny, 
+    # so these cases add nothing to the gradient.
+    (d_h, d_r) = tvn_cdf_deriv(h, r)
+    is_floor = (prob <= tiny)[:, None]
+    d_h = weights[:, None]*np.divide(d_h, prob[:, None], out = np.zeros(d_h.shape), 
+                                     where = ~is_floor)
+    d_r = weights[:, None]*np.divide(d_r, prob[:, None], out = np.zeros(d_r.shape), 
+                                     where = ~is_floor)
+    d_mu = d_h*sign/sd
+    d_Sigma = np.zeros((3, 3))
+    for (pair_num, (j, k)) in enumerate(TVN_PAIRS):
+        d_Sigma[j, k] = d_Sigma[k, j] = np.dot(d_r[:, pair_num], 
+                                               sign[:, j]*sign[:, k])/(2*sd[j]*sd[k])
+        d_r_sd = np.dot(d_r[:, pair_num], r[:, pair_num])
+        d_Sigma[j, j] -= d_r_sd/(2*Sigma[j, j])
+        d_Sigma[k, k] -= d_r_sd/(2*Sigma[k, k])
+    d_Sigma[[0, 1, 2], [0, 1, 2]] -= np.sum(d_h*h, axis = 0)/(2*np.diag(Sigma))
+    
+    return((loglike, d_mu, d_Sigma))
+
+
+##################################################
+# Define functions for the trivariate probit model.
+##################################################
+
+# Models of the latent intents of the judges:
+# 'mu_only': separate means and an identity covariance matrix.
+# 'mu_const': separate means and a constant off-diagonal covariance.
+# 'mu_cov': separate means and a full covariance matrix.
+# 'cov_const': a common intercept and slope coefficients on covariates,
+#     with a constant off-diagonal covariance.
+# 'peer_fx': as in 'cov_const', plus slope coefficients on the covariates
+#     of the other judges, and an identity covariance matrix.
+# 'dis_aversn': as in 'peer_fx', with the dissent aversion parameter delta.
+TVP_MODEL_NAMES = ['mu_only', 'mu_const', 'mu_cov', 'cov_const', 'peer_fx', 'dis_aversn']
+
+# Models with covariates.
+TVP_COVAR_MODELS = ['cov_const', 'peer_fx', 'dis_aversn']
+
+
+# Create the list of judiciary panels,
+# with every permutation of three judges in x_judge.
+def alloc_judges(x_judge):
+    
+    # x_judge is an array of covariates for each judge,
+    # with a row for each judge and a column for each covariate.
+    # Judges are numbered from zero, in the order of expand.grid() in R,
+    # with the first judge changing fastest.
+    # Examples:
+    # alloc_judges(np.zeros((5, 2))).shape
+    # (60, 3)
+    
+    num_judges = x_judge.shape[0]
+    (j3, j2, j1) = np.meshgrid(np.arange(num_judges), np.arange(num_judges),
+                               np.arange(num_judges), indexing = 'ij')
+    panels = np.column_stack([j1.ravel(), j2.ravel(), j3.ravel()])
+    panels = panels[(panels[:, 0] != panels[:, 1]) & (panels[:, 0] != panels[:, 2])
+                    & (panels[:, 1] != panels[:, 2])]
+    
+    return(panels)
+
+
+# Get the number of parameters in each model.
+def tri_probit_num_params(model_name, num_covars = 0):
+    
+    if model_name == 'mu_only':
+        num_params = 3
+    elif model_name == 'mu_const':
+        num_params = 4
+    elif model_name == 'mu_cov':
+        num_params = 6
+    elif model_name == 'cov_const':
+        num_params = 2 + num_covars
+    elif model_name == 'peer_fx':
+        num_params = 1 + 2*num_covars
+    elif model_name == 'dis_aversn':
+        num_params = 1 + 2*num_covars + 1
+    else:
+        raise ValueError("Unknown model_name " + repr(model_name))
+    
+    return(num_params)
+
+
+# Translate a vector of parameters into a dictionary of parameters for a model.
+def tri_probit_vec2param(param, model_name, num_covars = 0):
+    
+    # The parameters in the mean equation come first,
+    # followed by the parameters that define Sigma, if any.
+    # Examples:
+    # tri_probit_vec2param(np.arange(1, 5), 'mu_const')
+    # tri_probit_vec2param(np.arange(1, 7), 'dis_aversn', num_covars = 2)
+    
+    param = np.asarray(param, dtype = float)
+    if len(param) != tri_probit_num_params(model_name, num_covars):
+        raise ValueError("param not correct length.")
+    if model_name in TVP_COVAR_MODELS and num_covars == 0:
+        raise ValueError("No covariates specified.")
+    
+    param_list = {"mu": None, "alpha": None, "beta": None, "gamma": None,
+                  "delta": None, "Sigma": np.eye(3)}
+    
+    # Parameters for the mean equation.
+    if model_name in TVP_COVAR_MODELS:
+        param_list['alpha'] = param[0]
+        param_list['beta'] = param[1:1 + num_covars]
+        num_mean_params = 1 + num_covars
+        if model_name in ['peer_fx', 'dis_aversn']:
+            param_list['gamma'] = param[1 + num_covars:1 + 2*num_covars]
+            num_mean_params = 1 + 2*num_covars
+        if model_name == 'dis_aversn':
+            param_list['delta'] = param[1 + 2*num_covars]
+    else:
+        param_list['mu'] = param[0:3]
+        num_mean_params = 3
+    
+    # Remaining parameters define the lower triangle of Sigma,
+    # in the order Sigma_21, Sigma_31, Sigma_32.
+    if model_name in ['mu_const', 'cov_const', 'mu_cov']:
+        Sigma = np.eye(3)
+        Sigma[[1, 2, 2], [0, 0, 1]] = param[num_mean_params:]
+        Sigma[[0, 0, 1], [1, 2, 2]] = Sigma[[1, 2, 2], [0, 0, 1]]
+        param_list['Sigma'] = Sigma
+    
+    return(param_list)
+
+
+# Translate a dictionary of parameters for a model into a vector of parameters.
+def tri_probit_param2vec(param_list, model_name):
+    
+    # Parameters outside the specified model are ignored.
+    # Examples:
+    # tri_probit_param2vec(tri_probit_vec2param(np.arange(1, 5), 'mu_const'), 'mu_const')
+    # array([1., 2., 3., 4.])
+    
+    if model_name in TVP_COVAR_MODELS:
+        param = [np.atleast_1d(param_list['alpha']), param_list['beta']]
+        if model_name in ['peer_fx', 'dis_aversn']:
+            param.append(param_list['gamma'])
+        if model_name == 'dis_aversn':
+            param.append(np.atleast_1d(param_list['delta']))
+    else:
+        param = [param_list['mu']]
+    
+    Sigma = param_list['Sigma']
+    if model_name in ['mu_const', 'cov_const']:
+        param.append([Sigma[1, 0]])
+    elif model_name == 'mu_cov':
+        param.append([Sigma[1, 0], Sigma[2, 0], Sigma[2, 1]])
+    
+    return(np.concatenate([np.asarray(param_sub, dtype = float) for param_sub in param]))
+
+
+# Calculate the mean latent intents for all cases,
+# given the stacked covariates x of the three judges on each panel.
+def judges_mean_intent(alpha, beta, gamma, model_name, x):
+    
+    # x has a row for each case, with the covariates of the first judge,
+    # then the second, then the third.
+    # The peer effects are the covariates of the other two judges
+    # times the slope coefficients gamma.
+    # Examples:
+    # judges_mean_intent(0.25, np.array([1, 2]), np.array([-0.5, -1]), 'peer_fx',
+    #                    np.array([[0, 1, 0, 1, 1, 0]]))
+    # array([[ 0.75,  0.75, -0.75]])
+    
+    num_covars = len(beta)
+    x_judge_123 = np.asarray(x, dtype = float).reshape(-1, 3, num_covars)
+    mu = alpha + x_judge_123 @ beta
+    
+    # Add peer effects, if required.
+    if model_name in ['peer_fx', 'dis_aversn']:
+        mu = mu + (x_judge_123.sum(axis = 1) @ gamma)[:, None] - x_judge_123 @ gamma
+    
+    return(mu)
+
+
+# Matrices for dissent aversion, by the value of delta.
+# Cleared if it grows too large, as over many steps of the optimizer.
+DIS_AVERSN_MATRICES = {}
+
+
+# Get the matrices for the system of equations for dissent aversion, 
+# which depend only on delta.
+def get_dis_aversn_matrices(delta):
+    
+    # D_inv has (delta - 1)/den on the diagonal and -delta/den elsewhere, 
+    # so Sigma = D_inv D_inv has the same pattern, in closed form. 
+    # Also returns the derivative of D_inv with respect to delta 
+    # and the Cholesky factor of Sigma, for drawing latent intents, 
+    # which is None at delta = 0.5 or -1, where D_inv is not defined, 
+    # or close enough that Sigma is not numerically positive definite.
+    # Examples:
+    # get_dis_aversn_matrices(0.25)['D_inv']
+    
+    delta = np.float64(delta)
+    if delta not in DIS_AVERSN_MATRICES:
+        if len(DIS_AVERSN_MATRICES) > 1000:
+            DIS_AVERSN_MATRICES.clear()
+        
+        # Denominator common to matrices involving D_inverse.
+        den_D_inv = 2*delta**2 + delta - 1
+        d_den_D_inv = 4*delta + 1
+        (D_diag, D_off) = ((delta - 1)/den_D_inv, -delta/den_D_inv)
+        
+        # Calculate the transition matrix and the covariance matrix.
+        D_inv = np.full((3, 3), D_off)
+        np.fill_diagonal(D_inv, D_diag)
+        Sigma = np.full((3, 3), 2*D_diag*D_off + D_off**2)
+        np.fill_diagonal(Sigma, D_diag**2 + 2*D_off**2)
+        
+        d_D_inv = np.full((3, 3), -(den_D_inv - delta*d_den_D_inv)/den_D_inv**2)
+        np.fill_diagonal(d_D_inv, (den_D_inv - (delta - 1)*d_den_D_inv)/den_D_inv**2)
+        
+        DIS_AVERSN_MATRICES[delta] = {"D_inv": D_inv, 
+                                      "Sigma": Sigma, 
+                                      "d_D_inv": d_D_inv, 
+                                      "Sigma_chol": None}
+        if np.all(np.isfinite(Sigma)):
+            try:
+                DIS_AVERSN_MATRICES[delta]['Sigma_chol'] = np.linalg.cholesky(Sigma)
+            except np.linalg.LinAlgError:
+                pass
+    
+    return(DIS_AVERSN_MATRICES[delta])
+
+
+# Modify the means and covariance matrix of the latent intents
+# for dissent aversion.
+def dis_aversn_params(mu_in, delta):
+    
+    # mu_in has a row of mean intents for each case, 
+    # which are all transformed in one matrix product.
+    # Examples:
+    # dis_aversn_params(np.array([[1, 2, 3]]), 0.25)['mu']
+    # array([[3.2, 4. , 4.8]])
+    
+    dis_av_mats = get_dis_aversn_matrices(delta)
+    
+    # Multiply the mean intent vectors by the "transition" matrix,
+    # and adjust the covariance matrix.
+    dis_av_pars = {"mu": np.asarray(mu_in, dtype = float) @ dis_av_mats['D_inv'],
+                   "Sigma": dis_av_mats['Sigma'],
+                   "D_inv": dis_av_mats['D_inv']}
+    
+    return(dis_av_pars)
+
+
+# Calculate the means of the latent intents for all cases
+# and the covariance matrix, from the dictionary of parameters.
+def tri_probit_moments(param_list, model_name, num_cases, x = None):
+    
+    if model_name in TVP_COVAR_MODELS:
+        mu = judges_mean_intent(param_list['alpha'], param_list['beta'],
+                                param_list['gamma'], model_name, x)
+    else:
+        mu = np.broadcast_to(param_list['mu'], (num_cases, 3))
+    Sigma = param_list['Sigma']
+    
+    # Adjust the means and covariance for dissent aversion, if required.
+    if model_name == 'dis_aversn':
+        dis_av_pars = dis_aversn_params(mu, param_list['delta'])
+        mu = dis_av_pars['mu']
+        Sigma = dis_av_pars['Sigma']
+    
+    return((mu, Sigma))
+
+
+# Collapse the cases into cells with the same votes y and covariates x,
+# with the number of cases in each cell.
+def tri_probit_cells(y, x = None):
+    
+    # Cases in the same cell have the same probability, 
+    # so the likelihood is calculated once for each cell, 
+    # weighted by the number of cases. 
+    # Without covariates, the cells are the eight patterns of votes. 
+    # Examples:
+    # (y_cells, x_cells, weights) = tri_probit_cells(y, x)
+    # tri_probit_loglike(param, y_cells, x_cells, 'dis_aversn', weights)
+    
+    y = np.asarray(y, dtype = bool)
+    if x is None:
+        yx = y.astype(float)
+    else:
+        yx = np.column_stack([y, np.asarray(x, dtype = float)])
+    
+    # Sort the rows and keep the first row of each run of equal rows.
+    yx = yx[np.lexsort(yx.T[::-1])]
+    is_first = np.ones(yx.shape[0], dtype = bool)
+    is_first[1:] = np.any(yx[1:] != yx[:-1], axis = 1)
+    yx_cells = yx[is_first]
+    weights = np.diff(np.append(np.flatnonzero(is_first), yx.shape[0]))
+    y_cells = yx_cells[:, 0:3] > 0
+    x_cells = yx_cells[:, 3:] if x is not None else None
+    
+    return((y_cells, x_cells, weights))
+
+
+# Calculate the log-likelihood of the trivariate probit model.
+def tri_probit_loglike(param, y, x = None, model_name = 'mu_only', weights = None):
+    
+    # y is an array of votes, with a row of three booleans for each case,
+    # and x is the array of stacked covariates of the judges,
+    # for the models with covariates.
+    # With weights, each row stands for that many cases, 
+    # as in the cells from tri_probit_cells().
+    # Examples:
+    # tri_probit_loglike(np.zeros(3), np.array([[True, True, False], [True, True, False]]))
+    # -4.1588830833596715
+    # tri_probit_loglike(np.zeros(3), np.array([[True, True, False]]), weights = np.array([2]))
+    # -4.1588830833596715
+    
+    y = np.asarray(y, dtype = bool)
+    num_covars = x.shape[1]//3 if x is not None else 0
+    param_list = tri_probit_vec2param(param, model_name, num_covars)
+    (mu, Sigma) = tri_probit_moments(param_list, model_name, y.shape[0], x)
+    
+    # Calculate the probabilities of the observed outcomes.
+    # Probabilities are kept above zero, so the optimizer sees a finite value.
+    prob = tvn_orthant_prob(y, mu, Sigma)
+    log_prob = np.log(np.maximum(prob, np.finfo(float).tiny))
+    if weights is None:
+        loglike = np.sum(log_prob)
+    else:
+        loglike = np.dot(weights, log_prob)
+    
+    return(loglike)
+
+
+# Calculate the log-likelihood of the trivariate probit model 
+# and its gradient with respect to the vector of parameters.
+def tri_probit_loglike_grad(param, y, x = None, model_name = 'mu_only', weights = None):
+    
+    # The arguments are as in tri_probit_loglike().
+    # The derivatives with respect to the means and Sigma 
+    # are chained through the mean equation and, for dissent aversion, 
+    # through D_inv in get_dis_aversn_matrices().
+    # Examples:
+    # (loglike, grad) = tri_probit_loglike_grad(param, y_cells, x_cells, 'dis_aversn', weights)
+    
+    y = np.asarray(y, dtype = bool)
+    num_covars = x.shape[1]//3 if x is not None else 0
+    param_list = tri_probit_vec2param(param, model_name, num_covars)
+    if model_name in TVP_COVAR_MODELS:
+        x_judge_123 = np.asarray(x, dtype = float).reshape(-1, 3, num_covars)
+    
+    # Keep the means before the adjustment for dissent aversion, if required.
+    if model_name == 'dis_aversn':
+        mu_in = judges_mean_intent(param_list['alpha'], param_list['beta'],
+                                   param_list['gamma'], model_name, x)
+        dis_av_pars = dis_aversn_params(mu_in, param_list['delta'])
+        (mu, Sigma, D_inv) = (dis_av_pars['mu'], dis_av_pars['Sigma'], dis_av_pars['D_inv'])
+        d_D_inv = get_dis_aversn_matrices(param_list['delta'])['d_D_inv']
+    else:
+        (mu, Sigma) = tri_probit_moments(param_list, model_name, y.shape[0], x)
+    
+    (loglike, d_mu, d_Sigma) = tvn_orthant_loglike_grad(y, mu, Sigma, weights)
+    
+    # Derivatives for the parameters in the mean equation.
+    if model_name == 'dis_aversn':
+        d_delta = (np.sum(d_mu*(mu_in @ d_D_inv)) 
+                   + np.sum(d_Sigma*(d_D_inv @ D_inv + D_inv @ d_D_inv)))
+        d_mu = d_mu @ D_inv.T
+    if model_name in TVP_COVAR_MODELS:
+        grad = [[np.sum(d_mu)], np.einsum('ik,ikc->c', d_mu, x_judge_123)]
+        if model_name in ['peer_fx', 'dis_aversn']:
+            grad.append(np.sum(d_mu, axis = 1) @ x_judge_123.sum(axis = 1) - grad[1])
+        if model_name == 'dis_aversn':
+            grad.append([d_delta])
+    else:
+        grad = [np.sum(d_mu, axis = 0)]
+    
+    # Derivatives for the parameters in Sigma.
+    if model_name in ['mu_const', 'cov_const']:
+        grad.append([2*(d_Sigma[1, 0] + d_Sigma[2, 0] + d_Sigma[2, 1])])
+    elif model_name == 'mu_cov':
+        grad.append(2*d_Sigma[[1, 2, 2], [0, 0, 1]])
+    
+    return((loglike, np.concatenate([np.asarray(grad_sub, dtype = float) for grad_sub in grad])))
+
+
+# Calculate the Hessian matrix by central differences of the gradient,
+# with the default step size in optim() in R.
+def get_num_hessian(grad_fn, param, step = 1e-3):
+    
+    num_params = len(param)
+    hessian = np.zeros((num_params, num_params))
+    steps = np.eye(num_params)*step
+    for i in range(num_params):
+        hessian[:, i] = (grad_fn(param + steps[i]) - grad_fn(param - steps[i]))/(2*step)
+    
+    return((hessian + hessian.T)/2)
+
+
+# Estimate the parameters of the trivariate probit model.
+def tri_probit_estn(y, x = None, model_name = 'mu_only', param_0 = None,
+                    est_hessian = False):
+    
+    # The log-likelihood is maximized with BFGS, from param_0 or from zero, 
+    # with the analytic gradient from tri_probit_loglike_grad().
+    # The cases are collapsed into cells once, 
+    # so each step costs one probability for each distinct cell.
+    # Returns a dictionary of estimates,
+    # with the Hessian matrix of the log-likelihood, if est_hessian.
+    # Examples:
+    # estn_list = tri_probit_estn(y, x, 'dis_aversn', param_0 = np.zeros(6))
+    
+    if model_name in TVP_COVAR_MODELS:
+        num_covars = x.shape[1]//3
+    else:
+        num_covars = 0
+        x = None
+    num_params = tri_probit_num_params(model_name, num_covars)
+    if param_0 is None:
+        param_hat_0 = np.zeros(num_params)
+    elif len(param_0) == num_params:
+        param_hat_0 = np.asarray(param_0, dtype = float)
+    else:
+        raise ValueError("param not correct length.")
+    
+    # Maximize by minimizing the negative of the log-likelihood.
+    # Steps with a covariance matrix that is not positive definite, 
+    # or with delta = 0.5 or -1, where D_inv is not defined, 
+    # have zero likelihood, so the line search steps back.
+    # Steps with a likelihood or gradient that is not finite are treated the same.
+    (y_cells, x_cells, weights) = tri_probit_cells(y, x)
+    def neg_loglike_grad(param):
+        param_list = tri_probit_vec2param(param, model_name, num_covars)
+        Sigma = param_list['Sigma']
+        if model_name == 'dis_aversn':
+            delta = param_list['delta']
+            if 2*delta**2 + delta - 1 == 0:
+                return((np.inf, np.zeros(len(param))))
+            Sigma = get_dis_aversn_matrices(delta)['Sigma']
+        if not np.all(np.isfinite(Sigma)) or np.linalg.eigvalsh(Sigma)[0] <= 0:
+            return((np.inf, np.zeros(len(param))))
+        (loglike, grad) = tri_probit_loglike_grad(param, y_cells, x_cells, model_name, weights)
+        # Near those values of delta, the correlations are so close to one 
+        # that the derivatives are not defined.
+        if not np.isfinite(loglike) or not np.all(np.isfinite(grad)):
+            return((np.inf, np.zeros(len(param))))
+        return((-loglike, -grad))
+    tri_probit_optim = scipy.optimize.minimize(neg_loglike_grad, param_hat_0, 
+                                               method = 'BFGS', jac = True)
+    if not tri_probit_optim.success:
+        warnings.warn("In minimize(), " + tri_probit_optim.message)
+    
+    param_hat = tri_probit_optim.x
+    param_list = tri_probit_vec2param(param_hat, model_name, num_covars)
+    
+    estn_list = {"param_hat": param_hat,
+                 "mu_hat": param_list['mu'],
+                 "alpha_hat": param_list['alpha'],
+                 "beta_hat": param_list['beta'],
+                 "gamma_hat": param_list['gamma'],
+                 "delta_hat": param_list['delta'],
+                 "Sigma_hat": param_list['Sigma'],
+                 "max_like": -tri_probit_optim.fun,
+                 "hessian": None}
+    if est_hessian:
+        estn_list['hessian'] = -get_num_hessian(lambda param: neg_loglike_grad(param)[1], 
+                                                param_hat)
+    
+    return(estn_list)
+
+
+##################################################
+# Define functions for simulation.
+##################################################
+
+
+# Generate votes from the trivariate probit model, 
+# with each panel of judges from x_judge appearing n_cycles times.
+def TVP_vote_gen(param, model_name, x_judge, n_cycles, rng):
+    
+    # x_judge has a row of covariates for each judge 
+    # and rng is a numpy random Generator.
+    # The cases for each panel are in consecutive rows, 
+    # in the order of the panels from alloc_judges().
+    # Returns a dictionary with the votes y and the stacked covariates x.
+    # Examples:
+    # TVP_vote_gen(np.array([0.25, 1, 2, -0.5, -1, 0.1]), 'dis_aversn', 
+    #              x_judge, 3, np.random.default_rng(42))
+    
+    x_judge = np.asarray(x_judge, dtype = float)
+    panels = alloc_judges(x_judge)
+    x = np.repeat(x_judge[panels].reshape(panels.shape[0], -1), n_cycles, axis = 0)
+    num_covars = x_judge.shape[1] if model_name in TVP_COVAR_MODELS else 0
+    param_list = tri_probit_vec2param(param, model_name, num_covars)
+    (mu, Sigma) = tri_probit_moments(param_list, model_name, x.shape[0], x)
+    if model_name == 'dis_aversn':
+        Sigma_chol = get_dis_aversn_matrices(param_list['delta'])['Sigma_chol']
+        if Sigma_chol is None:
+            raise np.linalg.LinAlgError("Sigma is not positive definite at delta = " 
+                                        + str(param_list['delta']))
+    else:
+        Sigma_chol = np.linalg.cholesky(Sigma)
+    
+    # Calculate the latent intents and determine the votes of the panels.
+    nu = mu + rng.standard_normal((x.shape[0], 3)) @ Sigma_chol.T
+    TVP_votes = {"y": nu > 0, "x": x}
+    
+    return(TVP_votes)
+
+
+# Get the names of the parameters in each model, 
+# as in the columns of the simulation results.
+def get_tvp_param_names(model_name, num_covars = 0):
+    
+    # Examples:
+    # get_tvp_param_names('dis_aversn', 2)
+    # ['alpha', 'beta_1', 'beta_2', 'gamma_1', 'gamma_2', 'delta']
+    
+    if model_name in TVP_COVAR_MODELS:
+        param_names = ['alpha'] + ['beta_' + str(covar_num + 1) for covar_num in range(num_covars)]
+        if model_name in ['peer_fx', 'dis_aversn']:
+            param_names = param_names + ['gamma_' + str(covar_num + 1) 
+                                         for covar_num in range(num_covars)]
+        if model_name == 'dis_aversn':
+            param_names.append('delta')
+    else:
+        param_names = ['mu_1', 'mu_2', 'mu_3']
+    
+    if model_name in ['mu_const', 'cov_const']:
+        param_names.append('Sigma_21')
+    elif model_name == 'mu_cov':
+        param_names = param_names + ['Sigma_21', 'Sigma_31', 'Sigma_32']
+    
+    return(param_names)
+
+
+# Generate one replication of the votes and estimate the model, 
+# with the random numbers from seed_seq.
+def run_tvp_rep(rep_num, seed_seq, param_0, model_name, x_judge, n_cycles, param_start):
+    
+    # Returns the estimates, in the order of get_tvp_param_names(), 
+    # followed by the maximum value of the log-likelihood 
+    # and the value at the true parameters.
+    
+    rng = np.random.default_rng(seed_seq)
+    TVP_vote_sim = TVP_vote_gen(param_0, model_name, x_judge, n_cycles, rng)
+    with warnings.catch_warnings():
+        warnings.simplefilter('ignore')
+        estn_list = tri_probit_estn(TVP_vote_sim['y'], TVP_vote_sim['x'], model_name, 
+                                    param_0 = param_start)
+    x = TVP_vote_sim['x'] if model_name in TVP_COVAR_MODELS else None
+    true_like = tri_probit_loglike(param_0, TVP_vote_sim['y'], x, model_name)
+    
+    return([rep_num] + list(estn_list['param_hat']) + [estn_list['max_like'], true_like])
+
+
+# Read the results of the replications finished so far.
+def read_tvp_results(results_file, col_names):
+    
+    # A line without a newline at the end, 
+    # from an interrupted run, is dropped.
+    # Returns a list of rows, each a list of numbers.
+    
+    result_rows = []
+    if not os.path.isfile(results_file):
+        return(result_rows)
+    
+    with open(results_file, newline = '') as results:
+        lines = [line for line in results.readlines() if line.endswith('\n')]
+    if len(lines) == 0:
+        return(result_rows)
+    header = next(csv.reader(lines[0:1]))
+    if header != col_names:
+        raise ValueError("The columns in " + results_file + " do not match this simulation: " 
+                         + str(header))
+    for row in csv.reader(lines[1:]):
+        if len(row) == len(col_names):
+            result_rows.append([float(value) for value in row])
+    
+    return(result_rows)
+
+
+# Run the replications of the simulation in a pool of worker processes, 
+# writing each result to results_file as it finishes.
+def run_tvp_sims(param_0, model_name, x_judge, n_cycles, num_reps, results_file, 
+                 seed = 42, param_start = None, print_msg = True, workers = None):
+    
+    # Each replication rep_num draws from its own random stream, 
+    # spawned from seed, so the results do not depend on 
+    # the number of workers or the order in which replications finish.
+    # The replications already in results_file are skipped, 
+    # so an interrupted run continues where it stopped, 
+    # when it is called again with the same arguments.
+    # Estimation starts from param_start, or from zero.
+    # Returns a data frame of the estimates, with max_like and true_like, 
+    # in the order of the replications.
+    # 
+    # On Windows, new processes import the __main__ module, 
+    # so call this from a script under if __name__ == '__main__':
+    # or from an interactive session. 
+    # Examples:
+    # estn_results = run_tvp_sims(param_0, 'dis_aversn', x_judge, 3, 100, 'TVP_sims.csv')
+    # estn_results.describe()
+    
+    param_0 = np.asarray(param_0, dtype = float)
+    num_covars = np.shape(x_judge)[1] if model_name in TVP_COVAR_MODELS else 0
+    col_names = ['rep_num'] + get_tvp_param_names(model_name, num_covars) + ['max_like', 'true_like']
+    if workers is None:
+        workers = os.cpu_count()
+    
+    # Rewrite the results so far, without any incomplete line, 
+    # and select the replications that remain.
+    result_rows = read_tvp_results(results_file, col_names)
+    with open(results_file + '.tmp', 'w', newline = '') as results:
+        csv.writer(results).writerows([col_names] + result_rows)
+    os.replace(results_file + '.tmp', results_file)
+    done_rep_set = {int(result_row[0]) for result_row in result_rows}
+    seed_seqs = np.random.SeedSequence(seed).spawn(num_reps)
+    rep_list = [rep_num for rep_num in range(1, num_reps + 1) if rep_num not in done_rep_set]
+    
+    if print_msg:
+        print("Skipping " + str(num_reps - len(rep_list)) + " replications already finished")
+        print("Running " + str(len(rep_list)) + " replications with " 
+              + str(workers) + " workers")
+    
+    # Each result is written and flushed as soon as it is returned.
+    with open(results_file, 'a', newline = '') as results, \
+            concurrent.futures.ProcessPoolExecutor(max_workers = workers) as executor:
+        results_writer = csv.writer(results)
+        rep_futures = [executor.submit(run_tvp_rep, rep_num, seed_seqs[rep_num - 1], param_0, 
+                                       model_name, x_judge, n_cycles, param_start) 
+                       for rep_num in rep_list]
+        for (num_done, rep_future) in enumerate(concurrent.futures.as_completed(rep_futures)):
+            result_row = rep_future.result()
+            results_writer.writerow(result_row)
+            results.flush()
+            result_rows.append(result_row)
+            if print_msg:
+                print("Now completing iteration " + str(num_done + 1) + " of " 
+                      + str(len(rep_list)) + ": replication " + str(result_row[0]))
+    
+    estn_results = pd.DataFrame(result_rows, columns = col_names)
+    estn_results['rep_num'] = estn_results['rep_num'].astype(int)
+    estn_results = estn_results.sort_values(by = 'rep_num').set_index('rep_num')
+    
+    return(estn_results)
+
+
+##################################################
+# End
+##################################################
@@ -145,17 +145,8 @@ data_folder = 'Research\\Appeals_Reflection\\Westlaw_Data\\SH_Sample'
 
 
 # Loop over files across several years.
-# Append data from each year.
-appeals = pd.DataFrame(columns = ['file_name', 'case_code', 'circ_num', 
-                                      'pla_appnt_1', 'pla_appnt_2', 'pla_appnt_3', 
-                                      'def_appee_1', 'def_appee_2', 'def_appee_3', 'def_appee_4',
-                                      'case_num', 'case_num_list', 'num_case_nums', 
-                                      'case_num_1', 'case_num_2', 'case_num_3',
-                                      'case_date_1', 'case_date_2', 'case_date_3', 'case_date_4', 
-                                      'background', 
-                                      'holdings_hdr', 'outcome', 'posture', 
-                                      'judicial_panel', 'judge_names', 'num_judges', 
-                                      'judge_1', 'judge_2', 'judge_3', 'judge_4'])
+# Collect data from each year and combine them at the end.
+appeals_list = []
 
 for case_year in range(2000, 2019):
     print("Translating files for cases in year " + str(case_year))
@@ -183,6 +174,10 @@ for case_year in range(2000, 2019):
     # # Translate all files in a folder.
     # caser.doc2txt_dir(app, doc_path, txt_path)
     
+    # # Or translate only the new or changed files, without Word.
+    # doc_errors = caser.doc2txt_dir_native(doc_path, txt_path, 
+    #                                       manifest_file = txt_path + 'doc2txt_manifest.csv')
+    
     
     
     # Get list of all files in a given directory sorted by name
@@ -196,30 +191,45 @@ for case_year in range(2000, 2019):
     # Generate dataset from cases for each year.
     # fields = 'all'
     num_fields = 12
+    # Or read only some fields, for example, for rosters of judges:
+    # num_fields = ['circ_num', 'case_num_list', 'judge_names']
     print_msg = True
     appeals_sub = caser.get_case_df(txt_file_list, num_fields, print_msg)
+    # The functions below read the files in a pool of worker processes. 
+    # On Windows, the workers import this script again, 
+    # so run them only from an interactive session 
+    # or under if __name__ == '__main__'.
+    # Read only the files that are new or changed since the last run.
+    # (appeals_sub, case_errors) = caser.get_case_df_incremental(txt_file_list, num_fields, print_msg, 
+    #                                                            txt_path + 'case_manifest.csv')
+    # Or reuse the case info cached since the last change to caser.
+    # (appeals_sub, case_errors) = caser.get_case_df_cached(txt_file_list, num_fields, print_msg, 
+    #                                                       drive_path + data_folder + '\\case_cache.sqlite')
     
     
-    # Append into the full dataset. 
-    appeals = appeals.append(appeals_sub)
+    # Collect for the full dataset. 
+    appeals_list.append(appeals_sub)
     
     
     
     # End data collection.
 
 
-type(appeals)
-appeals.describe()
+# Combine into the full dataset, once. 
+appeals = caser.combine_case_dfs(appeals_list)
+
+# Store the full dataset (requires pyarrow), 
+# to read one circuit or year later without parsing the files again.
+# caser.write_case_parquet(appeals, drive_path + data_folder + '\\appeals_parquet')
+# appeals = caser.read_case_parquet(drive_path + data_folder + '\\appeals_parquet', 
+#                                   circ_num = 'Tenth Circuit', case_year = 2005)
 
-# Note that index is inherited from sub-data frames:
-# Index restarts at zero each year and multiple rows have same index.
-# Result is a series on each call of an "element".
-appeals.index
 
-# Fix this by replacing with a clean index. 
-appeals.index = range(appeals.shape[0])
+type(appeals)
+appeals.describe()
 
-# Much better.
+# Note that index is not inherited from sub-data frames:
+# combine_case_dfs() replaces it with a clean index.
 appeals.index
 
 
@@ -240,6 +250,16 @@ valid_counts[['background', 'holdings_hdr', 'outcome',
               'posture', 'judicial_panel']].describe()
 
 
+# Report the valid observations in one pass: 
+# counts and rates by field, by circuit and by year, 
+# with a sample of invalid values to inspect. 
+valid_report = caser.get_valid_report(appeals)
+caser.print_valid_report(valid_report)
+
+invalid_sample = valid_report['invalid_sample']
+invalid_sample[invalid_sample['field'] == 'judicial_panel']
+
+
 
 ##################################################
 # Inspect the fields individually.
@@ -251,30 +271,30 @@ valid_counts[['background', 'holdings_hdr', 'outcome',
 # Print selected fields to screen. 
 appeals['file_name']
 appeals['case_code']
-is_valid = caser.is_case_code_vec(appeals['case_code'])['is_valid']
+is_valid = caser.is_case_code_vec(appeals['case_code'])
 sum(is_valid)
 appeals['case_code'][is_valid == False]
 
 
 appeals['circ_num']
 appeals['circ_num'].unique()
-is_valid = caser.is_circ_num_vec(appeals['circ_num'])['is_valid']
+is_valid = caser.is_circ_num_vec(appeals['circ_num'])
 sum(is_valid)
 
 appeals['pla_appnt_1']
-is_valid = caser.is_pla_appnt_vec(appeals['pla_appnt_1'])['is_valid']
+is_valid = caser.is_pla_appnt_vec(appeals['pla_appnt_1'])
 sum(is_valid)
 appeals['pla_appnt_1'][is_valid == False]
 # One apellee in error: 158 in 2011.
 
 # Look for confounded parties:
-is_valid = caser.is_def_appee_vec(appeals['pla_appnt_1'])['is_valid']
+is_valid = caser.is_def_appee_vec(appeals['pla_appnt_1'])
 sum(is_valid)
 appeals['pla_appnt_1'][is_valid == True]
 
 
 appeals['pla_appnt_2']
-is_valid = caser.is_pla_appnt_vec(appeals['pla_appnt_2'])['is_valid']
+is_valid = caser.is_pla_appnt_vec(appeals['pla_appnt_2'])
 sum(is_valid)
 appeals['pla_appnt_2'][is_valid]
 appeals['pla_appnt_2'][is_valid == False].unique()
@@ -282,23 +302,23 @@ sum(appeals['pla_appnt_2'] == 'and')
 
 
 appeals['pla_appnt_3']
-is_valid = caser.is_pla_appnt_vec(appeals['pla_appnt_3'])['is_valid']
+is_valid = caser.is_pla_appnt_vec(appeals['pla_appnt_3'])
 sum(is_valid)
 appeals['pla_appnt_3'][is_valid == False].unique()
 appeals['pla_appnt_3'].unique()
 
 appeals['def_appee_1']
-is_valid = caser.is_def_appee_vec(appeals['def_appee_1'])['is_valid']
+is_valid = caser.is_def_appee_vec(appeals['def_appee_1'])
 sum(is_valid)
 appeals['def_appee_1'][is_valid == False].unique()
 
 # Look for confounded parties:
-is_valid = caser.is_pla_appnt_vec(appeals['def_appee_1'])['is_valid']
+is_valid = caser.is_pla_appnt_vec(appeals['def_appee_1'])
 sum(is_valid)
 appeals['def_appee_1'][is_valid == False]
 
 appeals['def_appee_2']
-is_valid = caser.is_def_appee_vec(appeals['def_appee_2'])['is_valid']
+is_valid = caser.is_def_appee_vec(appeals['def_appee_2'])
 sum(is_valid)
 
 appeals['def_appee_3']
@@ -306,7 +326,7 @@ appeals['def_appee_4']
 
 
 appeals['case_num']
-is_valid = caser.is_case_num_vec(appeals['case_num'])['is_valid']
+is_valid = caser.is_case_num_vec(appeals['case_num'])
 sum(is_valid)
 appeals['case_num'][is_valid == False].unique()
 
@@ -411,7 +431,7 @@ appeals['case_date_4']
 
 
 appeals['background']
-is_valid = caser.is_background_vec(appeals['background'])['is_valid']
+is_valid = caser.is_background_vec(appeals['background'])
 sum(is_valid)
 appeals['background'][is_valid == False].unique()
 # Some are legitimately missing the background.
@@ -420,14 +440,14 @@ appeals[['file_name', 'background']][is_valid == False]
 
 
 appeals['holdings_hdr']
-is_valid = caser.is_holdings_hdr_vec(appeals['holdings_hdr'])['is_valid']
+is_valid = caser.is_holdings_hdr_vec(appeals['holdings_hdr'])
 sum(is_valid)
 appeals['holdings_hdr'][is_valid == False].unique()
 
 
 appeals['outcome']
 appeals['outcome'].unique()
-is_valid = caser.is_outcome_vec(appeals['outcome'])['is_valid']
+is_valid = caser.is_outcome_vec(appeals['outcome'])
 sum(is_valid)
 appeals['outcome'][is_valid == False].unique()
 
@@ -436,14 +456,14 @@ appeals['outcome'][is_valid == False].unique()
 
 
 appeals['posture']
-is_valid = caser.is_posture_vec(appeals['posture'])['is_valid']
+is_valid = caser.is_posture_vec(appeals['posture'])
 sum(is_valid)
 appeals['posture'][is_valid == False].unique()
 
 
 
 appeals['judicial_panel']
-is_valid = caser.is_panel_vec(appeals['judicial_panel'])['is_valid']
+is_valid = caser.is_panel_vec(appeals['judicial_panel'])
 sum(is_valid)
 appeals['judicial_panel'][is_valid == False].unique()
 
@@ -504,31 +524,14 @@ appeals['circ_num'].unique()
 appeals['circ_num'].value_counts()
 circ_num_list = appeals['circ_num'].unique()
 # These are consistent enough to use as a reliable group by variable. 
+# The circuit codes are categorical, missing where no circuit is named.
+appeals['circ_code'].value_counts(dropna = False)
 
 
 # Create a master table of judges. 
-judge_list_cols = ['circ_num', 'judge_name']
-judge_list = pd.DataFrame(columns = judge_list_cols)
-
-# Stack all of the first three judges names and remove duplicates. 
-
-is_valid = caser.is_panel_vec(appeals['judicial_panel'])['is_valid']
-judge_list_sub = appeals[['circ_num', 'judge_1']][is_valid == True]
-judge_list_sub.columns = judge_list_cols
-judge_list = judge_list.append(judge_list_sub)
-
-judge_list_sub = appeals[['circ_num', 'judge_2']][is_valid == True]
-judge_list_sub.columns = judge_list_cols
-judge_list = judge_list.append(judge_list_sub)
-
-judge_list_sub = appeals[['circ_num', 'judge_3']][is_valid == True]
-judge_list_sub.columns = judge_list_cols
-judge_list = judge_list.append(judge_list_sub)
-
-
-
-judge_list.index = range(judge_list.shape[0])
-
+# Stack all of the first three judges names 
+# and preserve number of appearances with a group_by.
+judge_list = caser.get_judge_list(appeals)
 
 # Select unique judge names. 
 # judge_list = judge_list.drop_duplicates()
@@ -537,10 +540,6 @@ judge_list.index = range(judge_list.shape[0])
 # Now only 1154 judges total. 
 # Down to 1010 after rmoving invalids and converting to upper case. 
 
-# Instead, preserve number of appearances with a group_by.
-judge_list['num'] = 1
-judge_list = judge_list.groupby(['circ_num','judge_name'], as_index = False).sum()
-
 judge_list.index
 judge_list.columns
 
@@ -550,9 +549,18 @@ circ_num_sel = 'First Circuit'
 judge_list[['circ_num','judge_name']][judge_list['circ_num'] == circ_num_sel].value_counts()
 
 
-judge_list.sort_values(by=['circ_num','judge_name'], inplace = True)
-
 judge_list.to_csv('judge_list.csv')
+# caser.write_judge_parquet(judge_list, 'judge_list_parquet')
+
+
+# Link the judges on the panels to the FJC records of appellate judges.
+fjc_judges = caser.read_fjc_judges('..\\judge_data\\FJC_app_judge_list.csv')
+judge_index = caser.get_judge_index(fjc_judges)
+judge_nids = caser.get_judge_nid_df(appeals, judge_index)
+appeals = pd.concat([appeals, judge_nids], axis = 1)
+
+# Share of judges on the panels linked to FJC records.
+judge_nids.notna().mean()
 
 # # In 2000:
 # txt_file_num = 224 # Legit 10 judges.
@@ -704,7 +712,7 @@ import caser
 
 
 # Run functions one at a time.
-with open(txt_file, 'r', encoding = 'utf-16') as file:
+with caser.open_case_text(txt_file) as file:
     
     case_code = caser.get_case_code(file)
     print(case_code)
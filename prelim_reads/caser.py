@@ -28,8 +28,25 @@
 # Import Modules.
 ##################################################
 
+import io
 import os
+import re
+import sys
+import mmap
+import glob
+import struct
+import time
+import pickle
+import sqlite3
+import difflib
+import hashlib
+import zipfile
+import itertools
+import unicodedata
+import concurrent.futures
+from xml.etree import ElementTree
 
+import numpy as np
 import pandas as pd
 
 
@@ -63,6 +80,603 @@ def doc2txt_file(app, doc_file, txt_file):
     doc.Close()
 
 
+##################################################
+# Define functions for translating files without Word.
+##################################################
+
+# Word 97-2003 doc files are OLE compound files 
+# that contain a WordDocument stream and a table stream. 
+# docx files are zip files that contain word/document.xml.
+OLE_SIGNATURE = b'\xd0\xcf\x11\xe0\xa1\xb1\x1a\xe1'
+OLE_MAX_SECTOR = 0xFFFFFFFA
+OLE_NO_STREAM = 0xFFFFFFFF
+WORD_SCHEMA = '{http://schemas.openxmlformats.org/wordprocessingml/2006/main}'
+
+# Special characters in the text of a doc file, 
+# replaced as Word does when saving as txt.
+# Paragraph marks, line breaks and page breaks end a line,
+# table cells are separated by tabs,
+# and pictures, footnote references and optional hyphens are removed.
+WORD_CHAR_MAP = {0x0D: '\n', 0x0B: '\n', 0x0C: '\n', 0x07: '\t', 
+                 0x1E: '-', 0x1F: None, 0x01: None, 0x02: None, 0x05: None, 0x08: None}
+
+
+# Read streams from the top level of an OLE compound file.
+def read_ole_streams(ole_bytes, stream_names):
+    
+    if ole_bytes[0:8] != OLE_SIGNATURE:
+        raise ValueError("Not an OLE compound file.")
+    
+    # Read the dimensions from the header.
+    sector_size = 1 << struct.unpack_from('<H', ole_bytes, 0x1E)[0]
+    mini_sector_size = 1 << struct.unpack_from('<H', ole_bytes, 0x20)[0]
+    (num_fat_sectors, first_dir_sector) = struct.unpack_from('<II', ole_bytes, 0x2C)
+    (mini_cutoff, first_mini_fat_sector, num_mini_fat_sectors, 
+     first_difat_sector, num_difat_sectors) = struct.unpack_from('<IIIII', ole_bytes, 0x38)
+    
+    def read_sector(sector):
+        sector_start = (sector + 1)*sector_size
+        return(ole_bytes[sector_start:(sector_start + sector_size)])
+    
+    def read_chain(sector, alloc_table, read_fn):
+        chain = []
+        while sector < OLE_MAX_SECTOR:
+            if len(chain) > len(alloc_table):
+                raise ValueError("Cycle in sector chain of OLE compound file.")
+            chain.append(read_fn(sector))
+            sector = alloc_table[sector]
+        return(b''.join(chain))
+    
+    def unpack_sectors(sector_bytes):
+        return(struct.unpack('<%dI' % (len(sector_bytes)//4), sector_bytes))
+    
+    # Collect the locations of the sectors of the allocation table, 
+    # which are listed in the header and then in a chain of DIFAT sectors.
+    fat_sectors = list(struct.unpack_from('<109I', ole_bytes, 0x4C))
+    difat_sector = first_difat_sector
+    for difat_num in range(num_difat_sectors):
+        if difat_sector >= OLE_MAX_SECTOR:
+            break
+        difat_entries = unpack_sectors(read_sector(difat_sector))
+        fat_sectors.extend(difat_entries[0:-1])
+        difat_sector = difat_entries[-1]
+    fat = unpack_sectors(b''.join(read_sector(sector) 
+                                  for sector in fat_sectors[0:num_fat_sectors]))
+    
+    # Read the directory: 128 bytes for each entry.
+    dir_bytes = read_chain(first_dir_sector, fat, read_sector)
+    dir_entries = []
+    for entry_start in range(0, len(dir_bytes) - 127, 128):
+        entry = dir_bytes[entry_start:(entry_start + 128)]
+        name_len = struct.unpack_from('<H', entry, 0x40)[0]
+        (left_id, right_id, child_id) = struct.unpack_from('<III', entry, 0x44)
+        (start_sector, stream_size) = struct.unpack_from('<IQ', entry, 0x74)
+        if sector_size == 512:
+            # Only the lower 32 bits of the size are valid in version 3.
+            stream_size = stream_size & 0xFFFFFFFF
+        dir_entries.append({'name': entry[0:max(name_len - 2, 0)].decode('utf-16-le', 'replace'),
+                            'type': entry[0x42], 
+                            'left_id': left_id, 'right_id': right_id, 'child_id': child_id, 
+                            'start_sector': start_sector, 'stream_size': stream_size})
+    
+    # Small streams are stored in mini sectors within the mini stream, 
+    # which starts at the sector of the root entry.
+    root_entry = dir_entries[0]
+    mini_stream = read_chain(root_entry['start_sector'], fat, read_sector)
+    mini_stream = mini_stream[0:root_entry['stream_size']]
+    mini_fat = unpack_sectors(read_chain(first_mini_fat_sector, fat, read_sector))
+    
+    def read_mini_sector(sector):
+        sector_start = sector*mini_sector_size
+        return(mini_stream[sector_start:(sector_start + mini_sector_size)])
+    
+    # Search the tree of entries at the top level, below the root.
+    streams = {}
+    entry_ids = [root_entry['child_id']]
+    while len(entry_ids) > 0:
+        entry_id = entry_ids.pop()
+        if entry_id == OLE_NO_STREAM or entry_id >= len(dir_entries):
+            continue
+        entry = dir_entries[entry_id]
+        entry_ids.append(entry['left_id'])
+        entry_ids.append(entry['right_id'])
+        # Record requested streams (type 2).
+        if entry['type'] == 2 and entry['name'] in stream_names:
+            if entry['stream_size'] < mini_cutoff:
+                stream = read_chain(entry['start_sector'], mini_fat, read_mini_sector)
+            else:
+                stream = read_chain(entry['start_sector'], fat, read_sector)
+            streams[entry['name']] = stream[0:entry['stream_size']]
+    
+    return(streams)
+
+
+# Get the text of the main document from a Word 97-2003 doc file.
+def get_doc_text(doc_file):
+    
+    with open(doc_file, 'rb') as file:
+        ole_bytes = file.read()
+    streams = read_ole_streams(ole_bytes, ['WordDocument', '0Table', '1Table'])
+    if 'WordDocument' not in streams:
+        raise ValueError("No WordDocument stream in file " + doc_file)
+    word_doc = streams['WordDocument']
+    
+    # The File Information Block (FIB) at the start of the WordDocument stream
+    # locates the text in the table stream.
+    (w_ident, n_fib) = struct.unpack_from('<HH', word_doc, 0)
+    fib_flags = struct.unpack_from('<H', word_doc, 0x0A)[0]
+    if w_ident != 0xA5EC:
+        raise ValueError("Not a Word document: " + doc_file)
+    if fib_flags & 0x0100:
+        raise ValueError("Encrypted Word document: " + doc_file)
+    table_name = '1Table' if fib_flags & 0x0200 else '0Table'
+    table = streams[table_name]
+    
+    # Skip the variable-length arrays of the FIB to 
+    # the number of characters in the main document
+    # and the location of the piece table (Clx). 
+    csw = struct.unpack_from('<H', word_doc, 32)[0]
+    fib_pos = 34 + 2*csw
+    cslw = struct.unpack_from('<H', word_doc, fib_pos)[0]
+    ccp_text = struct.unpack_from('<i', word_doc, fib_pos + 2 + 12)[0]
+    fib_pos = fib_pos + 2 + 4*cslw
+    (fc_clx, lcb_clx) = struct.unpack_from('<II', word_doc, fib_pos + 2 + 33*8)
+    clx = table[fc_clx:(fc_clx + lcb_clx)]
+    
+    # Skip any property modifiers (Prc) before the piece table (Pcdt).
+    clx_pos = 0
+    while clx_pos < len(clx) and clx[clx_pos] == 0x01:
+        clx_pos = clx_pos + 3 + struct.unpack_from('<h', clx, clx_pos + 1)[0]
+    if clx_pos >= len(clx) or clx[clx_pos] != 0x02:
+        raise ValueError("No piece table in Word document: " + doc_file)
+    lcb_pcd = struct.unpack_from('<I', clx, clx_pos + 1)[0]
+    plc_pcd = clx[(clx_pos + 5):(clx_pos + 5 + lcb_pcd)]
+    
+    # The piece table has character positions for the start of each piece,
+    # followed by a descriptor with the location of the text of each piece.
+    num_pieces = (lcb_pcd - 4)//12
+    cp_list = struct.unpack_from('<%dI' % (num_pieces + 1), plc_pcd, 0)
+    text_list = []
+    for piece_num in range(num_pieces):
+        cp_start = cp_list[piece_num]
+        cp_end = min(cp_list[piece_num + 1], ccp_text)
+        if cp_end <= cp_start:
+            continue
+        fc = struct.unpack_from('<I', plc_pcd, 4*(num_pieces + 1) + 8*piece_num + 2)[0]
+        if fc & 0x40000000:
+            # Compressed pieces have one byte per character. 
+            fc_start = (fc & 0x3FFFFFFF)//2
+            text_list.append(word_doc[fc_start:(fc_start + cp_end - cp_start)]
+                             .decode('cp1252', 'replace'))
+        else:
+            text_list.append(word_doc[fc:(fc + 2*(cp_end - cp_start))]
+                             .decode('utf-16-le', 'replace'))
+    
+    return(clean_word_text(''.join(text_list)))
+
+
+# Replace the special characters in the text of a doc file.
+def clean_word_text(word_text):
+    
+    # Fields have the instructions between the characters 0x13 and 0x14, 
+    # and the displayed result between 0x14 and 0x15. 
+    # Keep only the displayed result, which might contain nested fields. 
+    text_list = []
+    field_list = []
+    for text_part in re.split('([\x13\x14\x15])', word_text):
+        if text_part == '\x13':
+            field_list.append(True)
+        elif text_part == '\x14':
+            if len(field_list) > 0:
+                field_list[-1] = False
+        elif text_part == '\x15':
+            if len(field_list) > 0:
+                field_list.pop()
+        elif True not in field_list:
+            text_list.append(text_part)
+    
+    return(''.join(text_list).translate(WORD_CHAR_MAP))
+
+
+# Get the text of the main document from a docx file,
+# with one line per paragraph.
+def get_docx_text(docx_file):
+    
+    with zipfile.ZipFile(docx_file) as docx_zip:
+        xml_content = docx_zip.read('word/document.xml')
+    xml_tree = ElementTree.fromstring(xml_content)
+    
+    text_list = []
+    get_docx_node_text(xml_tree, text_list)
+    
+    return(''.join(text_list))
+
+
+# Append the text in a node of the tree from word/document.xml.
+def get_docx_node_text(node, text_list):
+    
+    # Fields instructions and deleted text are in other tags, 
+    # which are not included. 
+    for child in node:
+        if child.tag == WORD_SCHEMA + 't':
+            text_list.append(child.text or '')
+        elif child.tag == WORD_SCHEMA + 'tab':
+            text_list.append('\t')
+        elif child.tag == WORD_SCHEMA + 'br' or child.tag == WORD_SCHEMA + 'cr':
+            text_list.append('\n')
+        elif child.tag == WORD_SCHEMA + 'noBreakHyphen':
+            text_list.append('-')
+        else:
+            get_docx_node_text(child, text_list)
+        if child.tag == WORD_SCHEMA + 'p':
+            text_list.append('\n')
+
+
+# Translate a single file from doc or docx to txt, without Word.
+def doc2txt_file_native(doc_file, txt_file):
+    
+    # Determine the format from the start of the file, 
+    # since some docx files are saved with the doc extension. 
+    with open(doc_file, 'rb') as file:
+        file_start = file.read(8)
+    if file_start == OLE_SIGNATURE:
+        doc_text = get_doc_text(doc_file)
+    elif file_start[0:2] == b'PK':
+        doc_text = get_docx_text(doc_file)
+    else:
+        raise ValueError("Not a doc or docx file: " + doc_file)
+    
+    # Write the same layout as Word saving as Unicode text: 
+    # UTF-16 with a byte order mark and CRLF at the end of each line.
+    with open(txt_file, 'w', encoding = 'utf-16-le', newline = '\r\n') as file:
+        file.write('\ufeff' + doc_text)
+
+
+# Translate a single file, returning the error message instead of raising an exception.
+def doc2txt_file_or_error(doc_file, txt_file):
+    
+    try:
+        doc2txt_file_native(doc_file, txt_file)
+        doc_error = None
+    except Exception as e:
+        doc_error = type(e).__name__ + ": " + str(e)
+    
+    return(doc_error)
+
+
+# Translate all doc and docx files in a directory, without Word.
+def doc2txt_dir_native(doc_path, txt_path, workers = None, print_msg = True, 
+                       manifest_file = None):
+    
+    # Translates the files in a pool of worker processes,
+    # unless workers = 1. 
+    # A file that fails to be translated is listed in doc_errors
+    # without stopping the others.
+    # With a manifest_file, only the files that are new or changed
+    # since the last run are translated. 
+    # The txt files are all written to txt_path, so files with the same name 
+    # in different subdirectories, or x.doc and x.docx, are not translated 
+    # and are listed in doc_errors, instead of overwriting each other.
+    # Examples:
+    # doc2txt_dir_native(doc_path, txt_path, 
+    #                    manifest_file = txt_path + 'doc2txt_manifest.csv')
+    
+    manifest = read_manifest(manifest_file)
+    
+    # Find all doc files to convert to txt in another folder.
+    txt_file_dict = {}
+    for subdir, dirs, files in os.walk(doc_path):
+        dirs.sort()
+        for file in sorted(files):
+            (file_base, file_ext) = os.path.splitext(file)
+            # Skip the lock files created by Word, starting with "~$".
+            if file_ext.lower() in ['.doc', '.docx'] and not file.startswith('~$'):
+                txt_file = os.path.join(txt_path, file_base + '.txt')
+                txt_file_key = os.path.normcase(os.path.abspath(txt_file))
+                txt_file_dict.setdefault(txt_file_key, []).append((os.path.join(subdir, file), 
+                                                                   txt_file))
+    
+    # Loop through the doc files with a txt file of their own.
+    doc_file_list = []
+    txt_file_list = []
+    dup_file_list = []
+    num_skipped = 0
+    for txt_file_key in txt_file_dict:
+        if len(txt_file_dict[txt_file_key]) > 1:
+            dup_file_list.extend(txt_file_dict[txt_file_key])
+            continue
+        (doc_file, txt_file) = txt_file_dict[txt_file_key][0]
+        # Skip the files already translated, if the txt file is still there.
+        if (manifest_file is not None and os.path.isfile(txt_file) 
+                and not is_stale_file(manifest, doc_file, os.path.abspath(txt_file))):
+            num_skipped = num_skipped + 1
+            continue
+        doc_file_list.append(doc_file)
+        txt_file_list.append(txt_file)
+    
+    if print_msg and manifest_file is not None:
+        print("Skipping " + str(num_skipped) + " files already translated")
+    
+    if workers == 1:
+        doc_results = map(doc2txt_file_or_error, doc_file_list, txt_file_list)
+        doc_error_list = list(doc_results)
+    else:
+        with concurrent.futures.ProcessPoolExecutor(max_workers = workers) as executor:
+            doc_results = executor.map(doc2txt_file_or_error, doc_file_list, txt_file_list, 
+                                       chunksize = 8)
+            doc_error_list = list(doc_results)
+    
+    # List the files that would overwrite the txt file of another file.
+    for (doc_file, txt_file) in dup_file_list:
+        doc_file_list.append(doc_file)
+        txt_file_list.append(txt_file)
+        doc_error_list.append("ValueError: Another doc file has the same txt file: " + txt_file)
+    
+    error_file_list = []
+    error_path_list = []
+    error_list = []
+    for (doc_file, doc_error) in zip(doc_file_list, doc_error_list):
+        if doc_error is not None:
+            error_file_list.append(os.path.split(doc_file)[1])
+            error_path_list.append(doc_file)
+            error_list.append(doc_error)
+            if print_msg:
+                print("Error exporting the txt version of " + doc_file + ": " + doc_error)
+    
+    if print_msg:
+        print("Exported the txt versions of " + str(len(doc_file_list) - len(error_list)) 
+              + " files with " + str(len(error_list)) + " errors")
+    
+    doc_errors = pd.DataFrame({'file_name': error_file_list, 
+                               'file_path': error_path_list, 
+                               'doc_error': error_list})
+    
+    if manifest_file is not None:
+        for (doc_file, txt_file, doc_error) in zip(doc_file_list, txt_file_list, doc_error_list):
+            if doc_error is None:
+                update_manifest(manifest, doc_file, os.path.abspath(txt_file))
+        prune_manifest(manifest)
+        write_manifest(manifest, manifest_file)
+    
+    return(doc_errors)
+
+
+##################################################
+# Define functions for incremental updates.
+##################################################
+
+# A manifest records the size, modification time and content hash
+# of each input file, along with the task performed on it:
+# the txt file written from a doc file, or the fields read from a txt file.
+# On a rerun, a file is skipped if the manifest shows that
+# the same task was done on the same contents.
+
+MANIFEST_COLUMNS = ['path', 'file_size', 'file_mtime_ns', 'file_hash', 'task']
+
+
+# Get the content hash of a file, reading it in blocks.
+def get_file_hash(file_path, block_size = 1 << 20):
+    
+    file_hash = hashlib.sha256()
+    with open(file_path, 'rb') as file:
+        for block in iter(lambda: file.read(block_size), b''):
+            file_hash.update(block)
+    
+    return(file_hash.hexdigest())
+
+
+# Read a manifest into a dictionary of records keyed by path.
+def read_manifest(manifest_file):
+    
+    # Returns an empty manifest if the file does not exist yet.
+    manifest = {}
+    if manifest_file is None or not os.path.isfile(manifest_file):
+        return(manifest)
+    
+    manifest_df = pd.read_csv(manifest_file, dtype = {'path': str, 'file_hash': str,
+                                                      'task': str},
+                              keep_default_na = False)
+    for record in manifest_df[MANIFEST_COLUMNS].to_dict('records'):
+        manifest[record['path']] = record
+    
+    return(manifest)
+
+
+# Write a manifest, replacing the previous version only when complete.
+def write_manifest(manifest, manifest_file):
+    
+    manifest_df = pd.DataFrame(list(manifest.values()), columns = MANIFEST_COLUMNS)
+    manifest_df.sort_values(by = 'path', inplace = True)
+    temp_file = manifest_file + '.tmp'
+    manifest_df.to_csv(temp_file, index = False)
+    os.replace(temp_file, manifest_file)
+
+
+# Determine whether a task needs to be done on a file,
+# given the record of the last time it was done.
+def is_stale_file(manifest, file_path, task):
+    
+    # The size and modification time are checked first.
+    # The file is only read to compute the content hash
+    # if the modification time changed but not the size,
+    # as when a file is copied or downloaded again.
+    path = os.path.abspath(file_path)
+    record = manifest.get(path)
+    if record is None or record['task'] != task:
+        return(True)
+    
+    file_stat = os.stat(file_path)
+    if file_stat.st_size != record['file_size']:
+        return(True)
+    if file_stat.st_mtime_ns == record['file_mtime_ns']:
+        return(False)
+    
+    if get_file_hash(file_path) != record['file_hash']:
+        return(True)
+    
+    # Same contents: record the new time to skip the hash next time.
+    record['file_mtime_ns'] = file_stat.st_mtime_ns
+    
+    return(False)
+
+
+# Record in the manifest that a task was done on a file.
+def update_manifest(manifest, file_path, task):
+    
+    path = os.path.abspath(file_path)
+    file_stat = os.stat(file_path)
+    manifest[path] = {'path': path,
+                      'file_size': file_stat.st_size,
+                      'file_mtime_ns': file_stat.st_mtime_ns,
+                      'file_hash': get_file_hash(file_path),
+                      'task': task}
+
+
+# Get the content hashes of a list of files, 
+# hashing only the files with a size or modification time 
+# other than in the manifest.
+def get_file_hash_list(manifest, file_list, task = 'file_hash'):
+    
+    file_hash_list = []
+    for file_path in file_list:
+        path = os.path.abspath(file_path)
+        record = manifest.get(path)
+        file_stat = os.stat(file_path)
+        if (record is None or record['file_size'] != file_stat.st_size
+                or record['file_mtime_ns'] != file_stat.st_mtime_ns):
+            record = {'path': path,
+                      'file_size': file_stat.st_size,
+                      'file_mtime_ns': file_stat.st_mtime_ns,
+                      'file_hash': get_file_hash(file_path),
+                      'task': task}
+            manifest[path] = record
+        file_hash_list.append(record['file_hash'])
+    
+    return(file_hash_list)
+
+
+# Remove the records of files that no longer exist.
+def prune_manifest(manifest):
+    
+    for path in list(manifest.keys()):
+        if not os.path.isfile(path):
+            del manifest[path]
+
+
+
+
+##################################################
+# Define functions for reading case files.
+##################################################
+
+# The case files are read in one piece and decoded once, 
+# with line endings translated as when reading a file in text mode.
+# Files at least CASE_MMAP_SIZE bytes are read through a memory map; 
+# smaller files are faster to read with a single call to read().
+CASE_MMAP_SIZE = 1 << 16
+
+
+# Get the encoding and the start of the text from the byte order mark.
+def get_utf16_encoding(txt_bytes):
+    
+    # Files are UTF-16, little-endian unless the byte order mark says otherwise.
+    if txt_bytes[0:2] == b'\xfe\xff':
+        return(('utf-16-be', 2))
+    elif txt_bytes[0:2] == b'\xff\xfe':
+        return(('utf-16-le', 2))
+    
+    return(('utf-16-le', 0))
+
+
+# Decode the bytes of a case file, translating the line endings.
+def decode_case_bytes(txt_bytes):
+    
+    # txt_bytes can be any buffer, such as a memory map.
+    (encoding, txt_start) = get_utf16_encoding(txt_bytes[0:2])
+    with memoryview(txt_bytes) as txt_view, txt_view[txt_start:] as txt_body:
+        case_txt = str(txt_body, encoding)
+    newline_decoder = io.IncrementalNewlineDecoder(None, translate = True)
+    
+    return(newline_decoder.decode(case_txt, final = True))
+
+
+# Read the text of a case file, decoded in bulk.
+def read_case_text(txt_file):
+    
+    # Examples:
+    # case_txt = read_case_text(txt_file)
+    # parse_state = init_parse_state('all')
+    # case_info = parse_case_lines(iter_case_text_lines(case_txt, parse_state), 'all', parse_state)
+    
+    with open(txt_file, 'rb') as file:
+        if os.fstat(file.fileno()).st_size < CASE_MMAP_SIZE:
+            return(decode_case_bytes(file.read()))
+        with mmap.mmap(file.fileno(), 0, access = mmap.ACCESS_READ) as txt_map:
+            case_txt = decode_case_bytes(txt_map)
+    
+    return(case_txt)
+
+
+# Open a case file for the get_* functions, which call file.readline().
+def open_case_text(txt_file):
+    
+    # Returns an in-memory file over the decoded text, 
+    # which can be used in place of open(txt_file, 'r', encoding = 'utf-16'). 
+    # Examples:
+    # with open_case_text(txt_file) as file:
+    #     case_code = get_case_code(file)
+    
+    return(io.StringIO(read_case_text(txt_file)))
+
+
+##################################################
+# Define functions for identifying fields.
+##################################################
+
+# The vector versions of the is_* functions test a full data frame column 
+# with the pandas string methods, using patterns equivalent to the tests on lines. 
+# They return a boolean series with the same index as the column, 
+# with False for missing values. 
+
+
+# Get the string methods of a column, for any type of column. 
+def get_str_col(df_col):
+    
+    return(df_col.astype(object).str)
+
+
+# Get a pattern that matches one character for which isdigit() is True, 
+# which includes superscripts and other digits not matched by \d.
+def get_digit_pattern():
+    
+    global DIGIT_PATTERN
+    if DIGIT_PATTERN is None:
+        digit_regex = re.compile(r'\d')
+        other_digits = [chr(char_num) for char_num in range(sys.maxunicode + 1) 
+                        if chr(char_num).isdigit() and not digit_regex.match(chr(char_num))]
+        DIGIT_PATTERN = '[\\d' + re.escape(''.join(other_digits)) + ']'
+    
+    return(DIGIT_PATTERN)
+
+DIGIT_PATTERN = None
+
+
+# Get a pattern that matches a word with any of the ignored characters 
+# before, after or between its letters, as if they were removed with replace().
+def get_word_pattern(word, ignored_chars):
+    
+    # Examples:
+    # get_word_pattern('Circuit', '.')
+    # matches 'Circuit', 'Circuit.' and 'C.i.r.c.u.i.t'
+    
+    ignored_pattern = '[' + re.escape(ignored_chars) + ']*'
+    word_pattern = (ignored_pattern 
+                    + ignored_pattern.join([re.escape(char) for char in word]) 
+                    + ignored_pattern)
+    
+    return(word_pattern)
+
+
 
 # Function to determine if a line contains the case code.
 def is_case_code(line):
@@ -77,13 +691,14 @@ def is_case_code(line):
 # Vector version for data frame columns:
 def is_case_code_vec(df_col): 
     
-    test_vec = pd.DataFrame(columns = ['is_valid'], 
-                           index = range(len(df_col)))
-    for row in range(len(df_col)):
-        test_row = is_case_code(df_col[row])
-        # test_row = is_case_code(df_col.loc[:, row])
-        test_vec['is_valid'][row] = test_row
-        
+    # The first word and either the last or the third word are all digits.
+    line_col = get_str_col(df_col)
+    digit = get_digit_pattern()
+    is_first_digit = line_col.match(r'\s*' + digit + r'+\s+\S', na = False)
+    is_last_digit = line_col.contains(r'\s' + digit + r'+\s*$', na = False)
+    is_third_digit = line_col.match(r'\s*\S+\s+\S+\s+' + digit + r'+(?:\s|$)', na = False)
+    test_vec = is_first_digit & (is_last_digit | is_third_digit)
+    
     return(test_vec)
 
 # Function to find and get the case code.
@@ -122,15 +737,97 @@ def is_circ_num(line):
 # Vector version for data frame columns:
 def is_circ_num_vec(df_col): 
     
-    test_vec = pd.DataFrame(columns = ['is_valid'], 
-                           index = range(len(df_col)))
-    for row in range(len(df_col)):
-        test_row = is_circ_num(df_col[row])
-        test_vec['is_valid'][row] = test_row
-        
+    # The last of at least two words is "Circuit", ignoring periods.
+    line_col = get_str_col(df_col)
+    test_vec = line_col.contains(r'\S\s+' + get_word_pattern('Circuit', '.') + r'\s*$', na = False)
+    
     return(test_vec)
 
 
+# Circuit codes, as in the FJC list of judges, 
+# and the names of the circuits, in order.
+CIRC_CODES = ['1', '2', '3', '4', '5', '6', '7', '8', '9', '10', '11', 'DC', 'FED']
+CIRC_NAMES = ['First Circuit', 'Second Circuit', 'Third Circuit', 'Fourth Circuit', 
+              'Fifth Circuit', 'Sixth Circuit', 'Seventh Circuit', 'Eighth Circuit', 
+              'Ninth Circuit', 'Tenth Circuit', 'Eleventh Circuit', 
+              'District of Columbia Circuit', 'Federal Circuit']
+CIRC_CODE_DTYPE = pd.CategoricalDtype(CIRC_CODES)
+
+# Normalization map from the words before "Circuit" in a circuit header
+# to the circuit code, in lower case without periods.
+CIRC_CODE_MAP = {'first': '1', 'second': '2', 'third': '3', 'fourth': '4', 
+                 'fifth': '5', 'sixth': '6', 'seventh': '7', 'eighth': '8', 
+                 'ninth': '9', 'tenth': '10', 'eleventh': '11', 
+                 '1st': '1', '2nd': '2', '3rd': '3', '4th': '4', '5th': '5', '6th': '6', 
+                 '7th': '7', '8th': '8', '9th': '9', '10th': '10', '11th': '11', 
+                 'district of columbia': 'DC', 'columbia': 'DC', 'dc': 'DC', 'd c': 'DC', 
+                 'federal': 'FED'}
+
+# Pattern for a key of CIRC_CODE_MAP immediately before "Circuit" or "Cir", 
+# trying the longest keys first.
+CIRC_CODE_PATTERN = re.compile(r'\b(' 
+                               + '|'.join([re.escape(circ_key) for circ_key 
+                                           in sorted(CIRC_CODE_MAP, key = len, reverse = True)]) 
+                               + r') (?:circuit|cir)\b')
+
+
+# Get the circuit code from a circuit header, or "NA".
+def get_circ_code(circ_num):
+    
+    # The circuit of the court is the last one named in the header, 
+    # as in 'Appeal from the Federal Circuit, Second Circuit'.
+    # Examples:
+    # get_circ_code('United States Court of Appeals, Tenth Circuit.')
+    # '10'
+    # get_circ_code('District of Columbia Circuit')
+    # 'DC'
+    # get_circ_code('The first claim')
+    # 'NA'
+    
+    circ_text = ' '.join(str(circ_num).lower().replace('.', ' ').split())
+    circ_match_list = CIRC_CODE_PATTERN.findall(circ_text)
+    if len(circ_match_list) == 0:
+        return("NA")
+    
+    return(CIRC_CODE_MAP[circ_match_list[-1]])
+
+# Vector version for data frame columns:
+def get_circ_code_vec(df_col):
+    
+    # Each distinct header is looked up once. 
+    # Returns a categorical series of circuit codes, 
+    # missing for headers that do not name a circuit.
+    (circ_index, circ_values) = pd.factorize(df_col.astype(object))
+    code_list = [get_circ_code(circ_num) for circ_num in circ_values]
+    # The last element is for missing headers, with index -1.
+    value_codes = np.array([CIRC_CODES.index(circ_code) if circ_code in CIRC_CODES else -1 
+                            for circ_code in code_list] + [-1], dtype = np.int64)
+    circ_codes = pd.Categorical.from_codes(value_codes[circ_index], dtype = CIRC_CODE_DTYPE)
+    
+    return(pd.Series(circ_codes, index = df_col.index, name = 'circ_code'))
+
+
+# Get the name of the circuit from a circuit header.
+def get_circ_name(line):
+    
+    # Headers that name a circuit are replaced by the name in CIRC_NAMES.
+    # Otherwise, remove common strings to streamline circuit numbers.
+    # Examples:
+    # get_circ_name('United States Court of Appeals, Tenth Circuit.')
+    # 'Tenth Circuit'
+    
+    circ_num = line.replace("\n","")
+    circ_code = get_circ_code(circ_num)
+    if circ_code != "NA":
+        return(CIRC_NAMES[CIRC_CODES.index(circ_code)])
+    
+    circ_num = circ_num.replace("United States Court of Appeals","")
+    circ_num = circ_num.replace(".","")
+    circ_num = circ_num.replace(",","")
+    
+    return(circ_num.strip())
+
+
 # Record the circuit number.
 def get_circ_num(file):
     
@@ -153,12 +850,7 @@ def get_circ_num(file):
     
     # The present line should be the circuit number.
     # circ_num = line.split()[0]
-    circ_num = line.replace("\n","")
-    # Remove common strings to streamline circuit numbers.
-    circ_num = circ_num.replace("United States Court of Appeals","")
-    circ_num = circ_num.replace(".","")
-    circ_num = circ_num.replace(",","")
-    circ_num = circ_num.strip()
+    circ_num = get_circ_name(line)
     
     return(circ_num)
 
@@ -191,12 +883,9 @@ def is_pla_appnt(line):
 # Vector version for data frame columns:
 def is_pla_appnt_vec(df_col): 
     
-    test_vec = pd.DataFrame(columns = ['is_valid'], 
-                           index = range(len(df_col)))
-    for row in range(len(df_col)):
-        test_row = is_pla_appnt(df_col[row])
-        test_vec['is_valid'][row] = test_row
-        
+    line_col = get_str_col(get_str_col(df_col).lower())
+    test_vec = line_col.contains('plaintiff|appellant|petitioner', na = False)
+    
     return(test_vec)
 
 
@@ -208,12 +897,9 @@ def is_def_appee(line):
 # Vector version for data frame columns:
 def is_def_appee_vec(df_col): 
     
-    test_vec = pd.DataFrame(columns = ['is_valid'], 
-                           index = range(len(df_col)))
-    for row in range(len(df_col)):
-        test_row = is_def_appee(df_col[row])
-        test_vec['is_valid'][row] = test_row
-        
+    line_col = get_str_col(get_str_col(df_col).lower())
+    test_vec = line_col.contains('defendant|appellee', na = False)
+    
     return(test_vec)
 
 
@@ -290,12 +976,16 @@ def is_case_num(line):
 # Vector version for data frame columns:
 def is_case_num_vec(df_col): 
     
-    test_vec = pd.DataFrame(columns = ['is_valid'], 
-                           index = range(len(df_col)))
-    for row in range(len(df_col)):
-        test_row = is_case_num(df_col[row])
-        test_vec['is_valid'][row] = test_row
-        
+    # Either a word "No.", "Nos." or "Docket", 
+    # or only digits and hyphens, as in is_case_num().
+    line_col = get_str_col(df_col)
+    is_docket_no_tag = line_col.contains(r'(?:^|\s)(?:No\.|Nos\.|Docket)(?:\s|$)', na = False)
+    digit = get_digit_pattern()
+    is_docket_no = (line_col.fullmatch(r'\s*(?:-cv|-|\n)*' + digit + r'(?:-cv|-|\n|' + digit + r')*\s*', 
+                                       na = False)
+                    & line_col.contains('-', regex = False, na = False))
+    test_vec = is_docket_no_tag | is_docket_no
+    
     return(test_vec)
 
 
@@ -338,6 +1028,75 @@ def is_case_num_str(sub_str):
 
 
 
+# Pattern of docket numbers, such as 04-6363, 2004-6363, 04-123, 04-12345, 
+# with a hyphen or an en dash, 
+# with optional suffixes as in 04-6363(L), 04-6363 (XAP) or 04-6363-cv, 
+# and optional ranges, as in 04-6363 to 04-6366 or 04-6363 through 6366.
+CASE_NUM_REGEX = re.compile(r"""
+    (?<!\d)(?P<year>\d{4}|\d{2})[-–](?P<serial>\d{3,5})(?!\d)
+    (?:-(?P<dash_suffix>[A-Za-z]{2,3})\b|\s?\((?P<paren_suffix>[A-Za-z]{1,4})\))?
+    (?:\s*(?:to|through|thru|\u2013|\u2014)\s*
+       (?:(?P<end_year>\d{4}|\d{2})-)?(?P<end_serial>\d{3,5})(?!\d))?
+    """, re.VERBOSE)
+
+# Ranges of docket numbers longer than this are not expanded.
+CASE_NUM_MAX_RANGE = 50
+
+
+# Convert the year of a docket number to four digits.
+def get_docket_year(year_str):
+    
+    year = int(year_str)
+    if len(year_str) == 2:
+        if year < 50:
+            year = 2000 + year
+        else:
+            year = 1900 + year
+    
+    return(year)
+
+
+# Get list of docket numbers from case_num string, 
+# as tuples of (year, serial, suffix).
+def get_docket_list(case_num):
+    
+    # Examples:
+    # get_docket_list('No. 04-6363.')
+    # [(2004, '6363', '')]
+    # get_docket_list('Nos. 04-6363(L), 04-6370(XAP).')
+    # [(2004, '6363', 'L'), (2004, '6370', 'XAP')]
+    # get_docket_list('Docket No. 04-1234-cv.')
+    # [(2004, '1234', 'CV')]
+    # get_docket_list('Nos. 04-6363 through 6365.')
+    # [(2004, '6363', ''), (2004, '6364', ''), (2004, '6365', '')]
+    
+    docket_list = []
+    for case_num_match in CASE_NUM_REGEX.finditer(case_num):
+        
+        year = get_docket_year(case_num_match.group('year'))
+        serial = case_num_match.group('serial')
+        suffix = (case_num_match.group('dash_suffix') 
+                  or case_num_match.group('paren_suffix') or '').upper()
+        docket_list.append((year, serial, suffix))
+        
+        # Expand a range of docket numbers in the same year.
+        end_serial = case_num_match.group('end_serial')
+        if end_serial is not None:
+            end_year = case_num_match.group('end_year')
+            if end_year is None:
+                end_year = year
+            else:
+                end_year = get_docket_year(end_year)
+            num_serials = int(end_serial) - int(serial)
+            if end_year == year and 0 < num_serials <= CASE_NUM_MAX_RANGE:
+                for serial_num in range(int(serial) + 1, int(end_serial) + 1):
+                    docket_list.append((year, str(serial_num).zfill(len(serial)), suffix))
+            else:
+                docket_list.append((end_year, end_serial, suffix))
+    
+    return(docket_list)
+
+
 # Get list of case numbers from case_num string. 
 def get_case_num_list(case_num):
     
@@ -350,6 +1109,21 @@ def get_case_num_list(case_num):
     # ['04-6363']
     # get_case_num_list('Nos. 04-6363, 04-6364.')
     # ['04-6363', '04-6364']
+    # get_case_num_list('Nos. 04-6363(L), 04-12345-cv.')
+    # ['04-6363', '04-12345']
+    
+    # Case numbers are written as YY-1234, without suffixes. 
+    case_num_list = []
+    for (year, serial, suffix) in get_docket_list(case_num):
+        case_num_list.append(str(year % 100).zfill(2) + '-' + serial)
+    
+    return(case_num_list)
+
+
+# Get list of case numbers from case_num string. 
+def get_case_num_list_depr(case_num):
+    # DEPRECATED: Only finds the YY-1234 pattern, one slice at a time. 
+    
     case_num_list = []
     
     # Loop through characters in string, looking for YY-1234 pattern. 
@@ -422,12 +1196,10 @@ def is_background(line):
 # Vector version for data frame columns:
 def is_background_vec(df_col): 
     
-    test_vec = pd.DataFrame(columns = ['is_valid'], 
-                           index = range(len(df_col)))
-    for row in range(len(df_col)):
-        test_row = is_background(df_col[row])
-        test_vec['is_valid'][row] = test_row
-        
+    # The first word is "Background", ignoring colons.
+    line_col = get_str_col(df_col)
+    test_vec = line_col.match(r'\s*' + get_word_pattern('Background', ':') + r'(?:\s|$)', na = False)
+    
     return(test_vec)
 
     
@@ -481,6 +1253,14 @@ def is_holdings_hdr_keyword(line_check):
            or line_check == "per"
            or line_check == "curiam")
 
+# Pattern of the keywords in lower case, 
+# ignoring the characters removed in is_holdings_hdr().
+HOLDINGS_HDR_KEYWORD_PATTERN = ('(?:' + '|'.join([get_word_pattern(keyword, '[]*:') 
+                                                  for keyword in ['holding', 'holdings', 'order', 
+                                                                  'opinion', 'memorandum', 'unpublished', 
+                                                                  'per', 'curiam']]) 
+                                + ')')
+
 # Determine whether line contains the verb "held".
 def is_holdings_hdr(line):
     line_list = line.split()
@@ -499,12 +1279,12 @@ def is_holdings_hdr(line):
 # Vector version for data frame columns:
 def is_holdings_hdr_vec(df_col): 
     
-    test_vec = pd.DataFrame(columns = ['is_valid'], 
-                           index = range(len(df_col)))
-    for row in range(len(df_col)):
-        test_row = is_holdings_hdr(df_col[row])
-        test_vec['is_valid'][row] = test_row
-        
+    # The first or second word is a keyword, 
+    # ignoring brackets, asterisks and colons, as in is_holdings_hdr().
+    line_col = get_str_col(get_str_col(df_col).lower())
+    test_vec = line_col.match(r'\s*(?:\S+\s+)?' + HOLDINGS_HDR_KEYWORD_PATTERN + r'(?:\s|$)', 
+                              na = False)
+    
     return(test_vec)
 
 
@@ -582,12 +1362,10 @@ def is_outcome(line):
 # Vector version for data frame columns:
 def is_outcome_vec(df_col): 
     
-    test_vec = pd.DataFrame(columns = ['is_valid'], 
-                           index = range(len(df_col)))
-    for row in range(len(df_col)):
-        test_row = is_outcome(df_col[row])
-        test_vec['is_valid'][row] = test_row
-        
+    line_col = get_str_col(get_str_col(df_col).lower())
+    test_vec = line_col.contains('affirm|reverse|vacate|remand|grant|deny|denied|dismiss', 
+                                 na = False)
+    
     return(test_vec)
 
 # Record the case outcome. 
@@ -617,12 +1395,11 @@ def is_posture(line):
 # Vector version for data frame columns:
 def is_posture_vec(df_col): 
     
-    test_vec = pd.DataFrame(columns = ['is_valid'], 
-                           index = range(len(df_col)))
-    for row in range(len(df_col)):
-        test_row = is_posture(df_col[row])
-        test_vec['is_valid'][row] = test_row
-        
+    # The first of at least two words is "Procedural"
+    # or the second word begins with "Posture".
+    line_col = get_str_col(df_col)
+    test_vec = line_col.match(r'\s*(?:Procedural\s+\S|\S+\s+Posture)', na = False)
+    
     return(test_vec)
 
 
@@ -693,12 +1470,14 @@ def is_panel(line):
 # Vector version for data frame columns:
 def is_panel_vec(df_col): 
     
-    test_vec = pd.DataFrame(columns = ['is_valid'], 
-                           index = range(len(df_col)))
-    for row in range(len(df_col)):
-        test_row = is_panel(df_col[row])
-        test_vec['is_valid'][row] = test_row
-        
+    # The first or second of at least two words begins with 
+    # "before" or "present" and the line contains "judge".
+    line_col = get_str_col(get_str_col(df_col).lower())
+    judge_hdr = line_col.match(r'\s*(?:(?:before|present)\S*\s+\S|\S+\s+(?:before|present))', 
+                               na = False)
+    contains_judge = line_col.contains('judge', regex = False, na = False)
+    test_vec = judge_hdr & contains_judge
+    
     return(test_vec)
 
 
@@ -869,8 +1648,134 @@ def get_judge_names(line):
     return(panel_list)
 
 
+# Phrases removed from judges' names, in the order they are replaced.
+# Phrases padded with spaces are whole words only. 
+# Add to the list to remove more phrases, 
+# then call set_judge_name_stop_phrases() to apply the change.
+JUDGE_NAME_STOP_PHRASES = [
+    # Remove judge titles.
+    ("Judges", " "), ("Judge", " "), ("Justice", " "), ("Circuit", " "), 
+    ("District", " "), ("Chief", " "), ("Associate", " "), ("Senior", " "), 
+    ("Supreme", " "), ("Hon", " "), ("Honorable", " "), ("Retired", " "), 
+    ("(Ret.)", " "), ("En banc", " "), 
+    # Remove other terminology. 
+    ("U.S.", " "), ("United States", " "), ("Court", " "), ("Appeals", " "), 
+    ("International Trade", " "), ("sitting by designation", " "), 
+    # Remove names or locations of courts.
+    ("First", " "), ("Second", " "), ("Third", " "), ("Fourth", " "), 
+    ("Fifth", " "), ("Sixth", " "), ("Seventh", " "), ("Eighth", " "), 
+    ("Ninth", " "), ("Tenth", " "), ("Eleventh", " "), ("Twelfth", " "), 
+    ("Northern", " "), ("Southern", " "), ("Eastern", " "), ("Western", " "), 
+    ("Middle", " "), ("Maryland", " "), ("West Virginia", " "), ("Virginia", " "), 
+    ("North Carolina", " "), ("South Carolina", " "), 
+    # Remove common words.
+    (" for ", " "), (" of ", " "), (" the ", " "), 
+    # Remove line endings and special characters.
+    ("\n", " "), (".", " "), ("*", " "), 
+    # Remove punctuation marks and bounds. 
+    (",", " "), (";", " "), (" and ", ""), (" & ", "")] + [
+    # Remove digits. 
+    (str(i), " ") for i in range(10)]
+
+
+# Compile the stop phrases into a pattern that matches 
+# each run of stop phrases and spaces in one pass.
+def compile_judge_name_stop_phrases(stop_phrases):
+    
+    # Words padded with spaces are matched without the spaces, 
+    # which are matched as part of the same run.
+    # Alternatives are grouped by the first character, 
+    # keeping the order of the list within each group. 
+    phrase_groups = {}
+    for (stop_phrase, new_str) in stop_phrases:
+        phrase = stop_phrase.strip(' ') or stop_phrase
+        phrase_groups.setdefault(phrase[0], []).append(re.escape(phrase[1:]))
+    
+    phrase_pattern_list = []
+    for (first_char, phrase_ends) in phrase_groups.items():
+        # A single character matches before any longer phrases that follow it.
+        if '' in phrase_ends:
+            phrase_ends = phrase_ends[0:(phrase_ends.index('') + 1)]
+        if phrase_ends == ['']:
+            phrase_pattern_list.append(re.escape(first_char))
+        else:
+            phrase_pattern_list.append(re.escape(first_char) 
+                                       + '(?:' + '|'.join(phrase_ends) + ')')
+    
+    phrase_pattern = '(?:' + '|'.join(phrase_pattern_list) + ')'
+    stop_phrase_regex = re.compile(' *' + phrase_pattern + '(?:' + phrase_pattern + '| )*')
+    
+    return(stop_phrase_regex)
+
+
+JUDGE_NAME_REGEX = compile_judge_name_stop_phrases(JUDGE_NAME_STOP_PHRASES)
+JUDGE_NAME_RUNS = {}
+JUDGE_NAMES = {}
+
+
+# Replace the stop phrases removed from judges' names.
+def set_judge_name_stop_phrases(stop_phrases):
+    
+    # Examples:
+    # set_judge_name_stop_phrases(JUDGE_NAME_STOP_PHRASES + [("Magistrate", " ")])
+    
+    global JUDGE_NAME_STOP_PHRASES, JUDGE_NAME_REGEX
+    JUDGE_NAME_STOP_PHRASES = list(stop_phrases)
+    JUDGE_NAME_REGEX = compile_judge_name_stop_phrases(JUDGE_NAME_STOP_PHRASES)
+    JUDGE_NAME_RUNS.clear()
+    JUDGE_NAMES.clear()
+
+
+# Remove the stop phrases from a run of stop phrases and spaces.
+def clean_judge_name_run(run_match):
+    
+    # The phrases are replaced in order, as in clean_judge_name_depr(). 
+    # Only the stop phrases and spaces in the run can be affected, 
+    # so the result is the same as for the full string. 
+    # Each distinct run is cleaned once. 
+    run_str = run_match.group()
+    clean_str = JUDGE_NAME_RUNS.get(run_str)
+    if clean_str is None:
+        clean_str = run_str
+        for (stop_phrase, new_str) in JUDGE_NAME_STOP_PHRASES:
+            clean_str = clean_str.replace(stop_phrase, new_str)
+        if len(JUDGE_NAME_RUNS) >= 100000:
+            JUDGE_NAME_RUNS.clear()
+        JUDGE_NAME_RUNS[run_str] = clean_str
+    
+    return(clean_str)
+
+
+# Remove titles, courts and punctuation from a judge's name.
 def clean_judge_name(judge_str):
     
+    # Examples:
+    # clean_judge_name(" Chief Judge, ")
+    # ''
+    # clean_judge_name(" J. W. MERRITT,")
+    # 'J  W  MERRITT'
+    
+    # The same names appear in many cases, so each is cleaned once. 
+    clean_str = JUDGE_NAMES.get(judge_str)
+    if clean_str is None:
+        
+        # Pad with spaces and remove all stop phrases in one pass.
+        clean_str = JUDGE_NAME_REGEX.sub(clean_judge_name_run, " " + judge_str + " ")
+        
+        # Strip the spaces produced by all of the above exclusions.
+        # Finally, return name in upper case to avoid unnecessary duplicates.
+        clean_str = clean_str.strip().upper()
+        
+        if len(JUDGE_NAMES) >= 100000:
+            JUDGE_NAMES.clear()
+        JUDGE_NAMES[judge_str] = clean_str
+    
+    return(clean_str)
+
+
+def clean_judge_name_depr(judge_str):
+    # DEPRECATED: Replaced with one pass over stop phrases in clean_judge_name().
+    
     # Pad with spaces. 
     clean_str = " " + judge_str + " "
     
@@ -1086,38 +1991,743 @@ def which_field(line):
 
 
 
-def get_case_info(txt_file, fields = 'all'):
+##################################################
+# Define functions for single-pass parsing of case files.
+##################################################
+
+
+# Flags for the classification of a line.
+# Each line is classified once, checking only the flags
+# required by the state of the parser when the line is read.
+LINE_CASE_CODE = 1 << 0
+LINE_CIRC_NUM = 1 << 1
+LINE_V = 1 << 2
+LINE_IN_RE = 1 << 3
+LINE_AND = 1 << 4
+LINE_CASE_NUM = 1 << 5
+LINE_SYNOPSIS = 1 << 6
+LINE_BLANK = 1 << 7
+LINE_BACKGROUND = 1 << 8
+LINE_HOLDINGS_HDR = 1 << 9
+LINE_POSTURE = 1 << 10
+LINE_WEST_NOTES = 1 << 11
+LINE_FINISHED_HOLDINGS = 1 << 12
+LINE_NONBLANK_START = 1 << 13
+LINE_JURISTS = 1 << 14
+LINE_PANEL = 1 << 15
+
+# Groups of flags that share the same preparation of the line.
+LINE_WORD_FLAGS = (LINE_CASE_CODE | LINE_CIRC_NUM | LINE_CASE_NUM | LINE_SYNOPSIS 
+                   | LINE_BACKGROUND | LINE_HOLDINGS_HDR | LINE_POSTURE)
+LINE_STRIP_FLAGS = LINE_V | LINE_AND | LINE_BLANK | LINE_JURISTS
+LINE_HOLDINGS_FLAGS = LINE_WEST_NOTES | LINE_FINISHED_HOLDINGS | LINE_NONBLANK_START
+
+
+# Classify a line, checking only the flags in the mask.
+def classify_line(line, mask):
     
-    # This version records only selected fields.
-    # Note the restriction that only consecutive ordering 
-    # of fields is permitted.
-    # Earlier fileds must be included for later fields to work.
+    # Examples:
+    # classify_line('United States Court of Appeals,', LINE_CIRC_NUM)
+    # 0
+    # classify_line('Tenth Circuit.', LINE_CIRC_NUM)
+    # 2
+    # classify_line('Before LUCERO, EBEL, and MURPHY, Circuit Judges.', LINE_JURISTS | LINE_PANEL)
+    # 32768
     
-    # Extract the fields from the file.
-    with open(txt_file, 'r', encoding = 'utf-16') as file:
+    flags = 0
+    
+    # Split the line only once for all flags that depend on the words.
+    if mask & LINE_WORD_FLAGS:
         
-        # Record the case code. 
-        if 'all' in fields or 'case_code' in fields:
-            case_code = get_case_code(file)
-        else:
-            case_code = "NA"
+        line_list = line.split()
+        num_words = len(line_list)
         
-        # Record the circuit number.
-        if 'all' in fields or 'circ_num' in fields:
-            circ_num = get_circ_num(file)
-        else:
-            circ_num = "NA"
+        # Case codes have digits at the beginning and end of the line.
+        if mask & LINE_CASE_CODE and num_words > 1 and line_list[0].isdigit():
+            if line_list[-1].isdigit() or (num_words > 2 and line_list[2].isdigit()):
+                flags |= LINE_CASE_CODE
         
-        # Record the names of parties.
-        # (pla_appnt, def_appee) = get_party_names(file)
-        if 'all' in fields or 'pla_appnt' in fields or 'def_appee' in fields:
-            (pla_appnt, def_appee, last_line) = get_party_names(file)
-        else:
-            pla_appnt = ["NA"]
-            def_appee = ["NA"]
+        if mask & LINE_CIRC_NUM and num_words > 1:
+            if line_list[-1].replace(".","") == "Circuit":
+                flags |= LINE_CIRC_NUM
         
-        # Record the case number.
-        # case_num = get_case_num(file)
+        # A case number either contains the word "Docket" or "No."
+        # or is a string of digits separated by dashes.
+        if mask & LINE_CASE_NUM:
+            if ("No." in line_list or "Nos." in line_list or "Docket" in line_list
+                or (line.strip().replace("-cv","").replace("-","").isdigit() and "-" in line)):
+                flags |= LINE_CASE_NUM
+        
+        if num_words > 0:
+            first_word = line_list[0].replace(":","")
+            if mask & LINE_SYNOPSIS and first_word == "Synopsis":
+                flags |= LINE_SYNOPSIS
+            if mask & LINE_BACKGROUND and first_word == "Background":
+                flags |= LINE_BACKGROUND
+            # The holdings header is labeled in the first or second word.
+            if mask & LINE_HOLDINGS_HDR:
+                if (is_holdings_hdr_keyword(first_word)
+                    or (num_words > 1 and is_holdings_hdr_keyword(line_list[1].replace(":","")))):
+                    flags |= LINE_HOLDINGS_HDR
+        
+        if mask & LINE_POSTURE and num_words > 1:
+            if line_list[0] == "Procedural" or line_list[1][0:7] == "Posture":
+                flags |= LINE_POSTURE
+    
+    # Strip the line only once for all flags that match the entire line.
+    if mask & LINE_STRIP_FLAGS:
+        
+        line_strip = line.strip()
+        
+        # Separators in the list of parties.
+        if mask & LINE_V and line_strip == "v":
+            flags |= LINE_V
+        if mask & LINE_AND and line_strip == "and":
+            flags |= LINE_AND
+        
+        # Skip lines with a pipe (|) or otherwise blank.
+        if mask & LINE_BLANK and (line_strip == "|" or line_strip == ""):
+            flags |= LINE_BLANK
+        
+        if mask & LINE_JURISTS and line_strip == "Attorneys and Law Firms":
+            flags |= LINE_JURISTS
+    
+    if mask & LINE_IN_RE and "in re" in line.lower():
+        flags |= LINE_IN_RE
+    
+    # Holdings are listed on lines that begin with "[".
+    if mask & LINE_HOLDINGS_FLAGS:
+        
+        if mask & LINE_WEST_NOTES and is_west_notes(line):
+            flags |= LINE_WEST_NOTES
+        
+        if line[0:1].strip() != '':
+            flags |= mask & LINE_NONBLANK_START
+            if line[0:1] != '[':
+                flags |= mask & LINE_FINISHED_HOLDINGS
+    
+    # The judicial panel should begin with "Before" or "Present"
+    # (sometimes after another word) and include a judge's title.
+    # Only the first two words are required.
+    if mask & LINE_PANEL and "judge" in line.lower():
+        hdr_list = line.split(None, 2)
+        if len(hdr_list) > 1 and (hdr_list[0][0:6].lower() == "before"
+                                  or hdr_list[1][0:6].lower() == "before"
+                                  or hdr_list[0][0:7].lower() == "present"
+                                  or hdr_list[1][0:7].lower() == "present"):
+            flags |= LINE_PANEL
+    
+    return(flags)
+
+
+# Initialize the state of the parser with missing values for every field.
+def init_parse_state(fields):
+    
+    parse_state = {
+        "fields": fields,
+        "last_state": get_last_parse_state(fields),
+        "lines_read": 0,
+        "case_code": "NA",
+        "circ_num": "NA",
+        "pla_appnt": ["NA"],
+        "def_appee": ["NA"],
+        "last_line": "",
+        "last_flags": 0,
+        "case_num": "NA",
+        "case_date": ["NA"],
+        "date_line": "",
+        "date_flags": 0,
+        "per_curiam": False,
+        "background": "NA",
+        "holdings": [],
+        "found_posture": False,
+        "posture": "NA",
+        "found_panel": False,
+        "judicial_panel": "NA",
+        "seek_flags": 0,
+        "seek_lines": 0
+        }
+    
+    return(parse_state)
+
+
+# Parser states for the case code and circuit number.
+def parse_case_code(parse_state, line, flags):
+    
+    parse_state['lines_read'] = parse_state['lines_read'] + 1
+    if flags & LINE_CASE_CODE or parse_state['lines_read'] == 20:
+        parse_state['case_code'] = line.replace("\n","")
+        return(next_parse_state(parse_state, 'case_code'))
+    
+    return('case_code')
+
+
+def parse_circ_num(parse_state, line, flags):
+    
+    parse_state['lines_read'] = parse_state['lines_read'] + 1
+    if flags & LINE_CIRC_NUM or parse_state['lines_read'] == 6:
+        parse_state['circ_num'] = get_circ_name(line)
+        return(next_parse_state(parse_state, 'circ_num'))
+    
+    return('circ_num')
+
+
+# Parser states for the names of parties.
+def enter_pla_appnt(parse_state):
+    
+    parse_state['pla_appnt'] = []
+    parse_state['def_appee'] = []
+    
+    return(True)
+
+def parse_pla_appnt(parse_state, line, flags):
+    
+    # The list of Plaintiff-Appellants is complete at a line "v", 
+    # a case number, or a case titled "In re".
+    if parse_state['lines_read'] == 0 and flags & LINE_IN_RE:
+        parse_state['pla_appnt'].append(line.replace("\n",""))
+    if flags & (LINE_V | LINE_IN_RE | LINE_CASE_NUM) or parse_state['lines_read'] == 20:
+        parse_state['last_line'] = line
+        parse_state['last_flags'] = flags
+        return(next_parse_state(parse_state, 'pla_appnt'))
+    
+    if not flags & LINE_AND:
+        parse_state['pla_appnt'].append(line.replace("\n",""))
+    parse_state['lines_read'] = parse_state['lines_read'] + 1
+    
+    return('pla_appnt')
+
+def enter_def_appee(parse_state):
+    
+    # A case number immediately after the Plaintiff-Appellants
+    # means that there are no Defendant-Appellees.
+    return(not parse_state['last_flags'] & LINE_CASE_NUM)
+
+def parse_def_appee(parse_state, line, flags):
+    
+    # When the next line is a case number, the list of Defendant-Appellees is complete.
+    if flags & LINE_CASE_NUM or parse_state['lines_read'] == 20:
+        parse_state['last_line'] = line
+        parse_state['last_flags'] = flags
+        return(next_parse_state(parse_state, 'def_appee'))
+    
+    if not flags & LINE_AND:
+        parse_state['def_appee'].append(line.replace("\n",""))
+    parse_state['lines_read'] = parse_state['lines_read'] + 1
+    
+    return('def_appee')
+
+
+# Parser state for the case number,
+# either from the last line of the parties or the next line.
+def enter_case_num(parse_state):
+    
+    if parse_state['last_flags'] & LINE_CASE_NUM:
+        parse_state['case_num'] = parse_state['last_line'].replace("\n","")
+        return(False)
+    
+    return(True)
+
+def parse_case_num(parse_state, line, flags):
+    
+    parse_state['case_num'] = line.replace("\n","")
+    
+    return(next_parse_state(parse_state, 'case_num'))
+
+
+# Parser state for the case date(s).
+def enter_case_date(parse_state):
+    
+    parse_state['case_date'] = []
+    
+    return(True)
+
+def parse_case_date(parse_state, line, flags):
+    
+    # After all dates is a line with "Synopsis", 
+    # "Attorneys and Law Firms", or the judicial panel.
+    parse_state['lines_read'] = parse_state['lines_read'] + 1
+    found_next = flags & (LINE_SYNOPSIS | LINE_JURISTS | LINE_PANEL)
+    if not found_next and not flags & LINE_BLANK:
+        parse_state['case_date'].append(line.replace("\n",""))
+    if found_next or parse_state['lines_read'] == 9:
+        # Pass the line for directing subsequent fields.
+        parse_state['date_line'] = line
+        parse_state['date_flags'] = flags
+        return(next_parse_state(parse_state, 'case_date'))
+    
+    return('case_date')
+
+
+# Parser state for the background paragraph.
+def enter_background(parse_state):
+    
+    # The background follows the header "Synopsis", if any.
+    if parse_state['date_flags'] & LINE_SYNOPSIS:
+        return(True)
+    if parse_state['date_flags'] & LINE_BACKGROUND:
+        parse_state['background'] = parse_state['date_line'].replace("\n","")
+        return(False)
+    
+    return(True)
+
+def parse_background(parse_state, line, flags):
+    
+    parse_state['lines_read'] = parse_state['lines_read'] + 1
+    if parse_state['date_flags'] & LINE_SYNOPSIS:
+        # Record the line after "Synopsis" 
+        # and skip another line, if it is not labeled background.
+        if parse_state['lines_read'] == 1:
+            parse_state['background'] = line.replace("\n","")
+            if flags & LINE_BACKGROUND:
+                return(next_parse_state(parse_state, 'background'))
+            return('background')
+    elif flags & LINE_BACKGROUND:
+        parse_state['background'] = line.replace("\n","")
+    
+    return(next_parse_state(parse_state, 'background'))
+
+
+# Parser states for the holdings header and the list of holdings.
+def enter_holdings_hdr(parse_state):
+    
+    parse_state['holdings'] = []
+    
+    return(True)
+
+def parse_holdings_hdr(parse_state, line, flags):
+    
+    # Skip a blank line, then skip lines to the holdings header, 
+    # stopping if reached procedural posture or West Headnotes.
+    parse_state['lines_read'] = parse_state['lines_read'] + 1
+    if parse_state['lines_read'] == 1:
+        return('holdings_hdr')
+    parse_state['found_posture'] = flags & (LINE_POSTURE | LINE_WEST_NOTES)
+    if flags & LINE_HOLDINGS_HDR or parse_state['found_posture'] or parse_state['lines_read'] == 7:
+        parse_state['holdings'].append(line.replace("\n",""))
+        return(next_parse_state(parse_state, 'holdings_hdr'))
+    
+    return('holdings_hdr')
+
+def enter_holdings(parse_state):
+    
+    return(not parse_state['found_posture'])
+
+def parse_holdings(parse_state, line, flags):
+    
+    # Record each line unless it is blank:
+    # the last line is the outcome. 
+    parse_state['lines_read'] = parse_state['lines_read'] + 1
+    if flags & LINE_NONBLANK_START:
+        parse_state['holdings'].append(line.replace("\n",""))
+    if (flags & (LINE_FINISHED_HOLDINGS | LINE_POSTURE | LINE_WEST_NOTES) 
+        or parse_state['lines_read'] == 20):
+        return(next_parse_state(parse_state, 'holdings'))
+    
+    return('holdings')
+
+
+# Parser state for the statement of "Procedural Posture(s)".
+def parse_posture(parse_state, line, flags):
+    
+    # Not all cases have procedural posture.
+    # If we reach "West Headnotes", we've gone too far.
+    parse_state['lines_read'] = parse_state['lines_read'] + 1
+    if flags & LINE_POSTURE:
+        parse_state['posture'] = line.replace("\n","")
+    if flags & (LINE_POSTURE | LINE_WEST_NOTES) or parse_state['lines_read'] == 8:
+        return(next_parse_state(parse_state, 'posture'))
+    
+    return('posture')
+
+
+# Parser states for the "Attorneys and Law Firms" and the judicial panel.
+def enter_jurists(parse_state):
+    
+    # The line after the date might already be one of these.
+    if parse_state['date_flags'] & LINE_PANEL:
+        parse_state['found_panel'] = True
+        parse_state['judicial_panel'] = parse_state['date_line']
+        return(False)
+    if parse_state['date_flags'] & LINE_JURISTS:
+        return(False)
+    
+    # Ask the source of lines to skip ahead to the jurists.
+    seek_parse_state(parse_state, LINE_JURISTS | LINE_PANEL, 500)
+    
+    return(True)
+
+def parse_jurists(parse_state, line, flags):
+    
+    # Don't record the commentary in between; skip to jurists. 
+    # Unless there is no heading "Attorneys and Law Firms".
+    # In that case, stop at the judicial panel.
+    parse_state['lines_read'] = parse_state['lines_read'] + 1
+    if flags & LINE_PANEL:
+        parse_state['found_panel'] = True
+        parse_state['judicial_panel'] = line
+    if flags & (LINE_JURISTS | LINE_PANEL) or parse_state['lines_read'] == 500:
+        return(next_parse_state(parse_state, 'jurists'))
+    
+    return('jurists')
+
+def enter_judicial_panel(parse_state):
+    
+    if parse_state['found_panel']:
+        return(False)
+    
+    # Ask the source of lines to skip ahead to the judicial panel.
+    seek_parse_state(parse_state, LINE_PANEL, 10)
+    
+    return(True)
+
+def parse_judicial_panel(parse_state, line, flags):
+    
+    # The last line read is recorded as the judicial panel.
+    parse_state['lines_read'] = parse_state['lines_read'] + 1
+    parse_state['judicial_panel'] = line
+    if flags & LINE_PANEL or parse_state['lines_read'] == 10:
+        return(next_parse_state(parse_state, 'judicial_panel'))
+    
+    return('judicial_panel')
+
+
+# Table of parser states, in the order that fields appear in a case file: 
+# (flags checked on each line, function to parse a line, 
+# function on entering the state (True if lines are required), 
+# fields that require this state).
+CASE_PARSE_TABLE = {
+    'case_code': 
+    (LINE_CASE_CODE, parse_case_code, None, 
+     ['case_code']), 
+    
+    'circ_num': 
+    (LINE_CIRC_NUM, parse_circ_num, None, 
+     ['circ_num']), 
+    
+    'pla_appnt': 
+    (LINE_V | LINE_IN_RE | LINE_AND | LINE_CASE_NUM, parse_pla_appnt, enter_pla_appnt, 
+     ['pla_appnt', 'def_appee']), 
+    
+    'def_appee': 
+    (LINE_AND | LINE_CASE_NUM, parse_def_appee, enter_def_appee, 
+     ['pla_appnt', 'def_appee']), 
+    
+    'case_num': 
+    (0, parse_case_num, enter_case_num, 
+     ['case_num', 'case_num_list']), 
+    
+    'case_date': 
+    (LINE_SYNOPSIS | LINE_JURISTS | LINE_PANEL | LINE_BLANK | LINE_BACKGROUND, 
+     parse_case_date, enter_case_date, 
+     ['case_date']), 
+    
+    'background': 
+    (LINE_BACKGROUND, parse_background, enter_background, 
+     ['background']), 
+    
+    'holdings_hdr': 
+    (LINE_HOLDINGS_HDR | LINE_POSTURE | LINE_WEST_NOTES, parse_holdings_hdr, enter_holdings_hdr, 
+     ['outcome', 'holdings_hdr']), 
+    
+    'holdings': 
+    (LINE_FINISHED_HOLDINGS | LINE_NONBLANK_START | LINE_POSTURE | LINE_WEST_NOTES, 
+     parse_holdings, enter_holdings, 
+     ['outcome', 'holdings_hdr']), 
+    
+    'posture': 
+    (LINE_POSTURE | LINE_WEST_NOTES, parse_posture, None, 
+     ['posture']), 
+    
+    'jurists': 
+    (LINE_JURISTS | LINE_PANEL, parse_jurists, enter_jurists, 
+     ['judicial_panel', 'judge_names']), 
+    
+    'judicial_panel': 
+    (LINE_PANEL, parse_judicial_panel, enter_judicial_panel, 
+     ['judicial_panel', 'judge_names'])
+    
+    }
+
+CASE_PARSE_STATES = list(CASE_PARSE_TABLE.keys())
+
+
+# The last parser state for each list of fields, computed once.
+LAST_PARSE_STATES = {}
+
+# Get the number of the last parser state required for the requested fields.
+def get_last_parse_state(fields):
+    
+    # Examples:
+    # get_last_parse_state(['circ_num'])
+    # 1
+    # get_last_parse_state([])
+    # -1
+    
+    fields_key = fields if isinstance(fields, str) else tuple(fields)
+    if fields_key not in LAST_PARSE_STATES:
+        last_state_num = -1
+        for state_num in range(len(CASE_PARSE_STATES)):
+            state_fields = CASE_PARSE_TABLE[CASE_PARSE_STATES[state_num]][3]
+            if 'all' in fields or any(field in fields for field in state_fields):
+                last_state_num = state_num
+        LAST_PARSE_STATES[fields_key] = last_state_num
+    
+    return(LAST_PARSE_STATES[fields_key])
+
+
+# Move to the next state that requires lines to be read.
+def next_parse_state(parse_state, state):
+    
+    if state == 'start':
+        state_num = 0
+    else:
+        state_num = CASE_PARSE_STATES.index(state) + 1
+    
+    # Stop after the last state required for the requested fields. 
+    # The states before it are read even for fields that are not requested, 
+    # because each state begins where the previous one ended.
+    while state_num <= parse_state['last_state']:
+        
+        next_state = CASE_PARSE_STATES[state_num]
+        state_num = state_num + 1
+        
+        # Some cases jump to "Attorneys and Law Firms"
+        # immediately after date.
+        # These typically have "per curiam" decisions
+        # without synopsis, background, posture and holdings.
+        if next_state == 'background':
+            parse_state['per_curiam'] = bool(parse_state['date_flags'] & LINE_JURISTS)
+        if parse_state['per_curiam'] and next_state in ['background', 'holdings_hdr', 
+                                                        'holdings', 'posture']:
+            continue
+        
+        (mask, parse_fn, enter_fn, state_fields) = CASE_PARSE_TABLE[next_state]
+        parse_state['lines_read'] = 0
+        if enter_fn is None or enter_fn(parse_state):
+            return(next_state)
+    
+    return('done')
+
+
+# Request that the source of lines skip ahead to the next line with seek_flags,
+# reading at most seek_lines lines, as the parser would have done.
+def seek_parse_state(parse_state, seek_flags, seek_lines):
+    
+    parse_state['seek_flags'] = seek_flags
+    parse_state['seek_lines'] = seek_lines
+
+
+# Skip ahead in the text of a case file to the line requested by seek_parse_state().
+def seek_case_text(case_txt, case_lower, line_start, parse_state):
+    
+    # Returns the position of the next line to pass to the parser
+    # and records the number of lines skipped in lines_read. 
+    # case_lower is case_txt.lower(), with the same length.
+    seek_flags = parse_state['seek_flags']
+    seek_lines = parse_state['seek_lines']
+    parse_state['seek_flags'] = 0
+    
+    # Candidate lines contain "Attorneys and Law Firms" or "judge" (in any case)
+    # and are checked with classify_line(), as the parser would, 
+    # counting the lines skipped on the way.
+    num_lines = 0
+    cand_start = line_start
+    while num_lines < seek_lines - 1:
+        
+        cand_list = []
+        if seek_flags & LINE_JURISTS:
+            cand_list.append(case_txt.find('Attorneys and Law Firms', cand_start))
+        if seek_flags & LINE_PANEL:
+            cand_list.append(case_lower.find('judge', cand_start))
+        cand_list = [cand for cand in cand_list if cand >= 0]
+        if len(cand_list) == 0:
+            break
+        
+        cand = min(cand_list)
+        next_start = case_txt.rfind('\n', cand_start, cand) + 1 or cand_start
+        num_lines = num_lines + case_txt.count('\n', cand_start, next_start)
+        cand_start = next_start
+        if num_lines >= seek_lines - 1:
+            break
+        
+        cand_end = case_txt.find('\n', cand) + 1 or len(case_txt)
+        if classify_line(case_txt[cand_start:cand_end], seek_flags) & seek_flags:
+            parse_state['lines_read'] = num_lines
+            return(cand_start)
+        num_lines = num_lines + 1
+        cand_start = cand_end
+    
+    # Otherwise, skip to the last line that the parser would read. 
+    # Past the end of the text, the lines are all empty, 
+    # so the parser need only read the last one.
+    num_lines = 0
+    while num_lines < seek_lines - 1 and line_start < len(case_txt):
+        line_start = case_txt.find('\n', line_start) + 1 or len(case_txt)
+        num_lines = num_lines + 1
+    if line_start >= len(case_txt):
+        num_lines = seek_lines - 1
+    parse_state['lines_read'] = num_lines
+    
+    return(line_start)
+
+
+# Iterate over the lines of the text of a case file, 
+# skipping ahead when the parser requests a seek.
+def iter_case_text_lines(case_txt, parse_state):
+    
+    # Lines end in "\n", as when reading a file in text mode.
+    # If lowercase changes the length of the text, 
+    # positions would not match, so read every line instead. 
+    case_lower = None
+    line_start = 0
+    while line_start < len(case_txt):
+        if parse_state['seek_flags']:
+            if case_lower is None:
+                case_lower = case_txt.lower()
+            if len(case_lower) == len(case_txt):
+                line_start = seek_case_text(case_txt, case_lower, line_start, parse_state)
+                if line_start >= len(case_txt):
+                    break
+            else:
+                parse_state['seek_flags'] = 0
+        line_end = case_txt.find('\n', line_start) + 1 or len(case_txt)
+        yield case_txt[line_start:line_end]
+        line_start = line_end
+
+
+# Parse the lines of a case file in a single pass.
+def parse_case_lines(lines, fields = 'all', parse_state = None):
+    
+    # Each line is read exactly once and classified once, 
+    # then passed to the function for the current state of the parser. 
+    # A source of lines that shares the parse_state can skip lines 
+    # when a state requests a seek (see iter_case_text_lines()); 
+    # other sources, such as a file, are read line by line.
+    if parse_state is None:
+        parse_state = init_parse_state(fields)
+    state = next_parse_state(parse_state, 'start')
+    
+    # At the end of the file, continue with empty lines, 
+    # as with file.readline(), until the parser is finished. 
+    line_state = None
+    for line in itertools.chain(lines, itertools.repeat('')):
+        if state == 'done':
+            break
+        if state != line_state:
+            line_state = state
+            (mask, parse_fn, enter_fn, state_fields) = CASE_PARSE_TABLE[state]
+        state = parse_fn(parse_state, line, classify_line(line, mask))
+    
+    # Record the holdings header and the case outcome.
+    holdings = parse_state['holdings']
+    if len(holdings) > 0:
+        holdings_hdr = holdings[0]
+        outcome = holdings[-1]
+    else:
+        holdings_hdr = "NA"
+        outcome = "NA"
+    
+    # Collect the fields into a dictionary.
+    case_info = {
+        "case_code":
+        parse_state['case_code'],
+        
+        "circ_num":
+        parse_state['circ_num'],
+        
+        "pla_appnt":
+        parse_state['pla_appnt'],
+        
+        "def_appee":
+        parse_state['def_appee'],
+        
+        "case_num":
+        parse_state['case_num'],
+        
+        "case_num_list":
+        get_case_num_list(parse_state['case_num']),
+        
+        "case_date":
+        parse_state['case_date'],
+        
+        "background":
+        parse_state['background'],
+        
+        "holdings_hdr":
+        holdings_hdr,
+        
+        "outcome":
+        outcome,
+        
+        "posture":
+        parse_state['posture'],
+        
+        "judicial_panel":
+        parse_state['judicial_panel'], 
+        
+        "judge_names":
+        get_judge_names(parse_state['judicial_panel'])
+        
+        }
+    
+    return(case_info)
+
+
+def get_case_info(txt_file, fields = 'all'):
+    
+    # Reads the file in a single pass, 
+    # moving through the fields in the order of CASE_PARSE_TABLE.
+    # fields can be any subset of CASE_FIELDS, or 'all': 
+    # reading stops after the last requested field. 
+    # Fields that are not requested, after the last requested field, are "NA".
+    # Examples:
+    # get_case_info(txt_file, ['circ_num', 'case_num_list', 'judge_names'])
+    
+    # Extract the fields from the text of the file, 
+    # seeking ahead to the jurists and the judicial panel.
+    case_txt = read_case_text(txt_file)
+    parse_state = init_parse_state(fields)
+    case_info = parse_case_lines(iter_case_text_lines(case_txt, parse_state), 
+                                 fields, parse_state)
+    
+    return(case_info)
+
+
+def get_case_info_depr(txt_file, fields = 'all'):
+    # DEPRECATED: Calls the get_* functions in sequence, 
+    # each of which rescans lines for its own field.
+    
+    # This version records only selected fields.
+    # Note the restriction that only consecutive ordering 
+    # of fields is permitted.
+    # Earlier fileds must be included for later fields to work.
+    
+    # Extract the fields from the file.
+    with open_case_text(txt_file) as file:
+        
+        # Record the case code. 
+        if 'all' in fields or 'case_code' in fields:
+            case_code = get_case_code(file)
+        else:
+            case_code = "NA"
+        
+        # Record the circuit number.
+        if 'all' in fields or 'circ_num' in fields:
+            circ_num = get_circ_num(file)
+        else:
+            circ_num = "NA"
+        
+        # Record the names of parties.
+        # (pla_appnt, def_appee) = get_party_names(file)
+        if 'all' in fields or 'pla_appnt' in fields or 'def_appee' in fields:
+            (pla_appnt, def_appee, last_line) = get_party_names(file)
+        else:
+            pla_appnt = ["NA"]
+            def_appee = ["NA"]
+        
+        # Record the case number.
+        # case_num = get_case_num(file)
         if 'all' in fields or 'case_num' in fields:
             case_num = get_case_num(file, last_line)
             case_num_list = get_case_num_list(case_num)
@@ -1234,6 +2844,171 @@ def get_case_info(txt_file, fields = 'all'):
         
     return(case_info)
 
+
+##################################################
+# Define functions for indexing lines of case files.
+##################################################
+
+# The line index of a case file holds the flags from classify_line() 
+# for every line, with the byte offset of the start of each line, 
+# so that the lines with a field can be found and read 
+# without reading the lines before them. 
+# It is stored next to the txt file, with the extension .lines.idx, 
+# and computed again when the size or modification time of the txt file changes. 
+
+# All flags from classify_line().
+LINE_ALL_FLAGS = (1 << 16) - 1
+
+# Encodings of case files, numbered in the stored index.
+LINE_INDEX_ENCODINGS = ['utf-16-le', 'utf-16-be']
+
+# Lines end with any of the line endings translated to "\n" in text mode.
+LINE_END_REGEX = re.compile(r'[^\r\n]*(?:\r\n|\r|\n)|[^\r\n]+')
+
+
+# Get the lines of a case file, as read in text mode, 
+# with the byte offsets of the start of each line.
+def get_offset_lines(txt_file):
+    
+    # Returns the tuple (lines, line_offsets, encoding), 
+    # in which line_offsets has one more element than lines, for the end of the file. 
+    with open(txt_file, 'rb') as file:
+        txt_bytes = file.read()
+    (encoding, txt_start) = get_utf16_encoding(txt_bytes)
+    
+    lines = []
+    line_offsets = [txt_start]
+    for raw_line in LINE_END_REGEX.findall(txt_bytes[txt_start:].decode(encoding)):
+        line_offsets.append(line_offsets[-1] + len(raw_line.encode(encoding)))
+        if raw_line.endswith('\r\n'):
+            raw_line = raw_line[0:-2] + '\n'
+        elif raw_line.endswith('\r'):
+            raw_line = raw_line[0:-1] + '\n'
+        lines.append(raw_line)
+    
+    return((lines, line_offsets, encoding))
+
+
+# Compute the line index of a case file.
+def get_line_index(txt_file):
+    
+    # Examples:
+    # line_index = get_line_index(txt_file)
+    # find_lines(line_index, LINE_PANEL)
+    
+    (lines, line_offsets, encoding) = get_offset_lines(txt_file)
+    line_flags = np.fromiter((classify_line(line, LINE_ALL_FLAGS) for line in lines), 
+                             dtype = np.uint32, count = len(lines))
+    
+    line_index = {"line_flags": line_flags, 
+                  "line_offsets": np.array(line_offsets, dtype = np.int64), 
+                  "encoding": encoding}
+    
+    return(line_index)
+
+
+# Get the name of the file with the line index of a case file.
+def get_line_index_file(txt_file):
+    
+    return(os.path.splitext(txt_file)[0] + '.lines.idx')
+
+
+# Store the line index of a case file next to it.
+def write_line_index(txt_file, line_index):
+    
+    # The index is stored as an array of 64-bit integers: 
+    # the size and modification time of the txt file, 
+    # to tell whether the index is up to date, 
+    # the encoding, the number of lines, the flags and the offsets.
+    file_stat = os.stat(txt_file)
+    line_flags = line_index['line_flags']
+    index_array = np.concatenate([np.array([file_stat.st_size, file_stat.st_mtime_ns, 
+                                            LINE_INDEX_ENCODINGS.index(line_index['encoding']), 
+                                            len(line_flags)], dtype = '<i8'), 
+                                  line_flags.astype('<i8'), 
+                                  line_index['line_offsets'].astype('<i8')])
+    index_file = get_line_index_file(txt_file)
+    index_array.tofile(index_file + '.tmp')
+    os.replace(index_file + '.tmp', index_file)
+
+
+# Read the line index of a case file, 
+# computing and storing it if it is missing or out of date.
+def read_line_index(txt_file):
+    
+    index_file = get_line_index_file(txt_file)
+    if os.path.isfile(index_file):
+        file_stat = os.stat(txt_file)
+        index_array = np.fromfile(index_file, dtype = '<i8')
+        if (len(index_array) >= 4
+            and index_array[0] == file_stat.st_size 
+            and index_array[1] == file_stat.st_mtime_ns
+            and len(index_array) == 5 + 2*index_array[3]):
+            num_lines = int(index_array[3])
+            line_index = {"line_flags": index_array[4:(4 + num_lines)].astype(np.uint32), 
+                          "line_offsets": index_array[(4 + num_lines):], 
+                          "encoding": LINE_INDEX_ENCODINGS[index_array[2]]}
+            return(line_index)
+    
+    line_index = get_line_index(txt_file)
+    write_line_index(txt_file, line_index)
+    
+    return(line_index)
+
+
+# Compute and store the line indexes of case files, for those out of date.
+def index_case_files(paths_or_glob, workers = None):
+    
+    # Accepts the same paths as iter_case_files().
+    # Returns the number of files indexed. 
+    txt_file_list = list(iter_case_files(paths_or_glob))
+    with concurrent.futures.ProcessPoolExecutor(max_workers = workers) as executor:
+        for line_index in executor.map(read_line_index, txt_file_list, chunksize = 16):
+            pass
+    
+    return(len(txt_file_list))
+
+
+# Find the numbers of the lines with any of the flags.
+def find_lines(line_index, flags):
+    
+    # Examples:
+    # find_lines(line_index, LINE_JURISTS | LINE_PANEL)
+    
+    line_nums = np.flatnonzero(line_index['line_flags'] & flags)
+    
+    return(line_nums)
+
+
+# Read lines from a case file, starting from a line in the index.
+def read_indexed_lines(txt_file, line_index, line_num, num_lines = 1):
+    
+    # Reads only the bytes of the lines requested, 
+    # with line endings as in text mode.
+    line_offsets = line_index['line_offsets']
+    end_num = min(line_num + num_lines, len(line_offsets) - 1)
+    if line_num >= end_num:
+        return([])
+    with open(txt_file, 'rb') as file:
+        file.seek(line_offsets[line_num])
+        txt_bytes = file.read(line_offsets[end_num] - line_offsets[line_num])
+    
+    lines = []
+    for raw_line in LINE_END_REGEX.findall(txt_bytes.decode(line_index['encoding'])):
+        if raw_line.endswith('\r\n'):
+            raw_line = raw_line[0:-2] + '\n'
+        elif raw_line.endswith('\r'):
+            raw_line = raw_line[0:-1] + '\n'
+        lines.append(raw_line)
+    
+    return(lines)
+
+
+##################################################
+# Define functions for collecting case info.
+##################################################
+
+# Print the case info.
 def print_case_info(case_info):
     
     
@@ -1278,154 +3053,1220 @@ def print_case_info(case_info):
     print(case_info["judge_names"])
     
 
-# Get data frame of case info from list of case files. 
-def get_case_df(txt_file_list, num_fields, print_msg):
+# Iterate over case files from a file, a directory, a glob pattern,
+# or a list of any of these.
+def iter_case_files(paths_or_glob):
     
-    # Loop over text file list.
-    num_files = len(txt_file_list)
-    txt_file_num_list = range(num_files)
-    
-    # Record field listed in order. 
-    field_list = ['file_name', 'case_code', 'circ_num', 
-          'pla_appnt', 
-          'def_appee',
-          'case_num', 
-          'case_date', 
-          'background', 
-          'holdings_hdr', 'outcome', 'posture', 'judicial_panel', 
-          'judge_names']
+    # Examples:
+    # list(iter_case_files(txt_path))
+    # list(iter_case_files(data_path + '\\Court_Docs_SH_LE_20*\\*.txt'))
+    # list(iter_case_files([txt_file_1, txt_file_2]))
+    
+    if isinstance(paths_or_glob, str):
+        paths_or_glob = [paths_or_glob]
+    
+    # Files are sorted by name within each directory or pattern.
+    for path in paths_or_glob:
+        if os.path.isfile(path):
+            yield path
+        else:
+            if os.path.isdir(path):
+                path = os.path.join(path, '*.txt')
+            for txt_file in sorted(filter(os.path.isfile, glob.glob(path))):
+                yield txt_file
+
+
+# Iterate over the case info of each file, one case at a time.
+def iter_cases(paths_or_glob, fields = 'all'):
+    
+    # Each file is opened only when the next case is requested, 
+    # so that memory does not grow with the number of cases.
+    # Each record is the dictionary of case info with the file name.
+    # Examples:
+    # for case_info in iter_cases(txt_path):
+    #     print(case_info['file_name'], case_info['judge_names'])
+    
+    for txt_file in iter_case_files(paths_or_glob):
+        case_info = {"file_name": os.path.split(txt_file)[1]}
+        case_info.update(get_case_info(txt_file, fields))
+        yield case_info
+
+
+# Fields of the case info, in the order that they appear in a case file.
+# case_num_list is computed from case_num and judge_names from judicial_panel.
+CASE_FIELDS = ['file_name', 'case_code', 'circ_num', 
+               'pla_appnt', 
+               'def_appee',
+               'case_num', 
+               'case_date', 
+               'background', 
+               'holdings_hdr', 'outcome', 'posture', 'judicial_panel', 
+               'judge_names']
+
+
+# Get the list of the first num_fields fields, in order, 
+# or check a list of fields.
+def get_case_fields(num_fields):
+    
+    # num_fields is either a number of fields from the start of CASE_FIELDS, 
+    # or a list of any fields in CASE_FIELDS or 'case_num_list'. 
+    # Examples:
+    # get_case_fields(3)
+    # ['file_name', 'case_code', 'circ_num']
+    # get_case_fields(['circ_num', 'case_num_list', 'judge_names'])
+    # ['circ_num', 'case_num_list', 'judge_names']
+    
+    if not isinstance(num_fields, int):
+        fields = list(num_fields)
+        for field in fields:
+            if field not in CASE_FIELDS and field not in ['case_num_list', 'all']:
+                raise ValueError("Unknown case field: " + str(field))
+        return(fields)
     
     fields = []
-    for field_num in range(min(num_fields, len(field_list))):
-        fields.append(field_list[field_num])
+    for field_num in range(min(num_fields, len(CASE_FIELDS))):
+        fields.append(CASE_FIELDS[field_num])
+    
+    return(fields)
+
+
+# Get data frame of case info from list of case files. 
+def get_case_df(txt_file_list, num_fields, print_msg):
+    
+    fields = get_case_fields(num_fields)
     
     if print_msg:
         print("List of fields:")
         print(fields)
     
-    
-    # Initialize data frame.
-    # Same fields in the data frame, regardless.
-    appeals = pd.DataFrame(columns = ['file_name', 'case_code', 'circ_num', 
-                                      'pla_appnt_1', 'pla_appnt_2', 'pla_appnt_3', 
-                                      'def_appee_1', 'def_appee_2', 'def_appee_3', 'def_appee_4',
-                                      'case_num', 'case_num_list', 'num_case_nums', 
-                                      'case_num_1', 'case_num_2', 'case_num_3',
-                                      'case_date_1', 'case_date_2', 'case_date_3', 'case_date_4', 
-                                      'background', 
-                                      'holdings_hdr', 'outcome', 'posture', 
-                                      'judicial_panel', 'judge_names', 'num_judges', 
-                                      'judge_1', 'judge_2', 'judge_3', 'judge_4'], 
-                           index = txt_file_num_list)
-    
-    for txt_file_num in txt_file_num_list:
-        
-        
-        # Read the information from this case.
-        txt_file = txt_file_list[txt_file_num]
+    # Loop over text file list.
+    case_info_list = []
+    for txt_file in txt_file_list:
         
         # Isolate the file name and primt a message.
         if print_msg:
             txt_file_name = os.path.split(txt_file)[1]
             print("Reading case information from file " + "'" +  txt_file_name + "'")
         
-        
         # Get the dictionary of case info.
+        case_info_list.append(get_case_info(txt_file, fields))
+    
+    appeals = get_case_info_df(txt_file_list, case_info_list)
+    
+    return(appeals)
+
+
+# Get the case info from a file, 
+# returning the error message instead of raising an exception.
+def get_case_info_or_error(txt_file, fields = 'all'):
+    
+    try:
         case_info = get_case_info(txt_file, fields)
+        case_error = None
+    except Exception as e:
+        case_info = None
+        case_error = type(e).__name__ + ": " + str(e)
+    
+    return((case_info, case_error))
+
+
+# Get data frame of case info from list of case files, 
+# reading the files in parallel. 
+def get_case_df_parallel(txt_file_list, num_fields, print_msg, 
+                         workers = None, chunksize = 8):
+    
+    # Reads the files in a pool of workers processes, 
+    # with rows in the same order as txt_file_list.
+    # A file that fails to be read gets missing values
+    # and is listed in case_errors, without stopping the others.
+    # Returns the tuple (appeals, case_errors), 
+    # with the name and the path of each file that failed.
+    # 
+    # On Windows, new processes import the __main__ module, 
+    # so call this from a script under if __name__ == '__main__':
+    # or from an interactive session. 
+    
+    fields = get_case_fields(num_fields)
+    if workers is None:
+        workers = os.cpu_count()
+    
+    if print_msg:
+        print("List of fields:")
+        print(fields)
+        print("Reading case information from " + str(len(txt_file_list)) 
+              + " files with " + str(workers) + " workers")
+    
+    # The pool returns results in the order of the files. 
+    case_info_list = []
+    error_file_list = []
+    error_path_list = []
+    error_list = []
+    with concurrent.futures.ProcessPoolExecutor(max_workers = workers) as executor:
+        case_results = executor.map(get_case_info_or_error, 
+                                    txt_file_list, itertools.repeat(fields), 
+                                    chunksize = chunksize)
+        for (txt_file, (case_info, case_error)) in zip(txt_file_list, case_results):
+            
+            txt_file_name = os.path.split(txt_file)[1]
+            if case_error is not None:
+                if print_msg:
+                    print("Error reading case information from file " 
+                          + "'" +  txt_file_name + "': " + case_error)
+                error_file_list.append(txt_file_name)
+                error_path_list.append(txt_file)
+                error_list.append(case_error)
+                # Record missing values for this file.
+                case_info = parse_case_lines([], fields = [])
+            
+            case_info_list.append(case_info)
+    
+    appeals = get_case_info_df(txt_file_list, case_info_list)
+    case_errors = pd.DataFrame({'file_name': error_file_list, 
+                                'file_path': error_path_list, 
+                                'case_error': error_list})
+    
+    if print_msg:
+        print("Read case information from " + str(len(txt_file_list) - len(error_list)) 
+              + " files with " + str(len(error_list)) + " errors")
+    
+    return((appeals, case_errors))
+
+
+# Get data frame of case info from list of case files,
+# reading only the files that are new or changed since the last run.
+def get_case_df_incremental(txt_file_list, num_fields, print_msg, manifest_file,
+                            workers = None):
+    
+    # The rows from the last run are stored next to the manifest,
+    # in a pickle file with the same name, so that lists are preserved.
+    # Files that fail to be read are not recorded
+    # and are read again on the next run.
+    # Returns the tuple (appeals, case_errors), as in get_case_df_parallel.
+    # Examples:
+    # (appeals_sub, case_errors) = get_case_df_incremental(txt_file_list, 12, True,
+    #                                  txt_path + 'case_manifest.csv')
+    
+    # The task includes the version of the parser, 
+    # so any change to this module marks every file to be read again.
+    fields = get_case_fields(num_fields)
+    task = get_parser_version() + ':' + ','.join(fields)
+    case_rows_file = os.path.splitext(manifest_file)[0] + '.pkl'
+    
+    manifest = read_manifest(manifest_file)
+    if os.path.isfile(case_rows_file):
+        case_rows = pd.read_pickle(case_rows_file)
+    else:
+        case_rows = pd.DataFrame(columns = CASE_DF_COLUMNS, dtype = object)
+    # Rows stored with other columns are read again.
+    if list(case_rows.columns) != CASE_DF_COLUMNS:
+        case_rows = pd.DataFrame(columns = CASE_DF_COLUMNS, dtype = object)
+    
+    # Select the files to read again.
+    path_list = [os.path.abspath(txt_file) for txt_file in txt_file_list]
+    stale_path_list = []
+    for path in path_list:
+        if path not in case_rows.index or is_stale_file(manifest, path, task):
+            stale_path_list.append(path)
+    
+    if print_msg:
+        print("Skipping " + str(len(path_list) - len(stale_path_list))
+              + " files already read")
+    
+    if len(stale_path_list) > 0:
+        (appeals_new, case_errors) = get_case_df_parallel(stale_path_list, num_fields,
+                                                          print_msg, workers)
+    else:
+        appeals_new = pd.DataFrame(columns = CASE_DF_COLUMNS, dtype = object)
+        case_errors = pd.DataFrame({'file_name': [], 'file_path': [], 'case_error': []})
+    appeals_new.index = stale_path_list
+    
+    # Assemble the rows in the order of the files.
+    stale_path_set = set(stale_path_list)
+    case_rows = case_rows[~case_rows.index.isin(stale_path_set)]
+    if len(case_rows) == 0:
+        case_rows = appeals_new
+    elif len(appeals_new) > 0:
+        case_rows = pd.concat([case_rows, appeals_new])
+    appeals = case_rows.loc[path_list].reset_index(drop = True)
+    
+    # Record the files read without errors, 
+    # matched by the full path, since files in different folders 
+    # can have the same name.
+    error_path_set = set(case_errors['file_path'])
+    for path in stale_path_list:
+        if path not in error_path_set:
+            update_manifest(manifest, path, task)
+        else:
+            manifest.pop(path, None)
+    prune_manifest(manifest)
+    case_rows = case_rows[case_rows.index.isin(set(manifest.keys()))]
+    case_rows.to_pickle(case_rows_file + '.tmp')
+    os.replace(case_rows_file + '.tmp', case_rows_file)
+    write_manifest(manifest, manifest_file)
+    
+    return((appeals, case_errors))
+
+
+##################################################
+# Define functions for caching case info.
+##################################################
+
+# The case info from each file is stored in an SQLite database,
+# keyed by the content hash of the file, the fields read
+# and the version of the parser, which is the hash of the source of this module.
+# Any change to this module invalidates the case info cached before the change.
+
+
+PARSER_VERSION = None
+
+
+# Get the version of the parser from the source of this module.
+def get_parser_version():
+    
+    global PARSER_VERSION
+    if PARSER_VERSION is None:
+        PARSER_VERSION = get_file_hash(os.path.abspath(__file__))[0:16]
+    
+    return(PARSER_VERSION)
+
+
+# Open the cache of case info, creating it if it does not exist.
+def open_case_cache(cache_file):
+    
+    # Examples:
+    # case_cache = open_case_cache(data_path + 'case_cache.sqlite')
+    
+    case_cache = sqlite3.connect(cache_file)
+    case_cache.execute("""CREATE TABLE IF NOT EXISTS case_info (
+                              file_hash TEXT NOT NULL,
+                              fields TEXT NOT NULL,
+                              parser_version TEXT NOT NULL,
+                              case_info BLOB NOT NULL,
+                              used_time REAL NOT NULL,
+                              PRIMARY KEY (parser_version, fields, file_hash))""")
+    case_cache.commit()
+    
+    return(case_cache)
+
+
+# Get the cached case info for a list of content hashes,
+# as a dictionary keyed by hash.
+def read_case_cache(case_cache, file_hash_list, fields):
+    
+    # All the cached case info for this version and fields is read at once,
+    # which is faster than one query per file for a whole corpus.
+    file_hash_set = set(file_hash_list)
+    case_info_dict = {}
+    cache_rows = case_cache.execute("""SELECT file_hash, case_info FROM case_info
+                                       WHERE parser_version = ? AND fields = ?""",
+                                    (get_parser_version(), ','.join(fields)))
+    for (file_hash, case_info_blob) in cache_rows:
+        if file_hash in file_hash_set:
+            case_info_dict[file_hash] = pickle.loads(case_info_blob)
+    
+    # Mark the cached case info as used, for eviction.
+    case_cache.execute("""UPDATE case_info SET used_time = ?
+                          WHERE parser_version = ? AND fields = ?""",
+                       (time.time(), get_parser_version(), ','.join(fields)))
+    case_cache.commit()
+    
+    return(case_info_dict)
+
+
+# Store case info in the cache, from a dictionary keyed by hash.
+def write_case_cache(case_cache, case_info_dict, fields):
+    
+    used_time = time.time()
+    cache_rows = [(file_hash, ','.join(fields), get_parser_version(),
+                   pickle.dumps(case_info, protocol = pickle.HIGHEST_PROTOCOL), used_time)
+                  for (file_hash, case_info) in case_info_dict.items()]
+    case_cache.executemany("""INSERT OR REPLACE INTO case_info
+                              (file_hash, fields, parser_version, case_info, used_time)
+                              VALUES (?, ?, ?, ?, ?)""", cache_rows)
+    case_cache.commit()
+
+
+# Remove the case info cached by old versions of the parser.
+def evict_case_cache(case_cache, num_versions = 2):
+    
+    # Keeps the num_versions versions of the parser used most recently,
+    # so that a change to the parser can be reverted without reading all files again.
+    # Returns the number of records removed.
+    version_rows = case_cache.execute("""SELECT parser_version FROM case_info
+                                         GROUP BY parser_version
+                                         ORDER BY MAX(used_time) DESC""").fetchall()
+    old_version_list = [version_row[0] for version_row in version_rows[num_versions:]]
+    num_removed = 0
+    for parser_version in old_version_list:
+        cache_rows = case_cache.execute("DELETE FROM case_info WHERE parser_version = ?",
+                                        (parser_version,))
+        num_removed = num_removed + cache_rows.rowcount
+    case_cache.commit()
+    if num_removed > 0:
+        case_cache.execute("VACUUM")
+    
+    return(num_removed)
+
+
+# Get data frame of case info from list of case files,
+# reading only the files missing from the cache.
+def get_case_df_cached(txt_file_list, num_fields, print_msg, cache_file,
+                       workers = None, num_versions = 2):
+    
+    # Files with the same contents share one record in the cache,
+    # so renamed or copied files are not read again.
+    # The content hashes are kept in a manifest next to the cache, 
+    # and a file is hashed again only if its size or modification time changed.
+    # Returns the tuple (appeals, case_errors), as in get_case_df_parallel.
+    # Examples:
+    # (appeals, case_errors) = get_case_df_cached(txt_file_list, 12, True,
+    #                                             data_path + 'case_cache.sqlite')
+    
+    fields = get_case_fields(num_fields)
+    manifest_file = os.path.splitext(cache_file)[0] + '_manifest.csv'
+    manifest = read_manifest(manifest_file)
+    file_hash_list = get_file_hash_list(manifest, txt_file_list)
+    prune_manifest(manifest)
+    write_manifest(manifest, manifest_file)
+    
+    case_cache = open_case_cache(cache_file)
+    try:
+        case_info_dict = read_case_cache(case_cache, file_hash_list, fields)
+    
+        # Read the files missing from the cache, once for each hash.
+        missing_file_dict = {}
+        for (txt_file, file_hash) in zip(txt_file_list, file_hash_list):
+            if file_hash not in case_info_dict:
+                missing_file_dict.setdefault(file_hash, txt_file)
+        missing_file_list = list(missing_file_dict.values())
+    
+        if print_msg:
+            print("Reading case information from " + str(len(missing_file_list))
+                  + " files missing from the cache of " + str(len(txt_file_list)) + " files")
+    
+        if workers == 1 or len(missing_file_list) <= 1:
+            case_results = list(map(get_case_info_or_error, missing_file_list,
+                                    itertools.repeat(fields)))
+        else:
+            with concurrent.futures.ProcessPoolExecutor(max_workers = workers) as executor:
+                case_results = list(executor.map(get_case_info_or_error, missing_file_list,
+                                                 itertools.repeat(fields), chunksize = 8))
+    
+        # Files that fail to be read are not cached and are read again on the next run.
+        new_case_info_dict = {}
+        error_dict = {}
+        for (file_hash, (case_info, case_error)) in zip(missing_file_dict.keys(), case_results):
+            if case_error is None:
+                new_case_info_dict[file_hash] = case_info
+            else:
+                error_dict[file_hash] = case_error
+        write_case_cache(case_cache, new_case_info_dict, fields)
+        evict_case_cache(case_cache, num_versions)
+    finally:
+        case_cache.close()
+    case_info_dict.update(new_case_info_dict)
+    
+    case_info_list = []
+    error_file_list = []
+    error_path_list = []
+    error_list = []
+    for (txt_file, file_hash) in zip(txt_file_list, file_hash_list):
+        if file_hash in error_dict:
+            txt_file_name = os.path.split(txt_file)[1]
+            if print_msg:
+                print("Error reading case information from file "
+                      + "'" +  txt_file_name + "': " + error_dict[file_hash])
+            error_file_list.append(txt_file_name)
+            error_path_list.append(txt_file)
+            error_list.append(error_dict[file_hash])
+            # Record missing values for this file.
+            case_info_list.append(parse_case_lines([], fields = []))
+        else:
+            case_info_list.append(case_info_dict[file_hash])
+    
+    appeals = get_case_info_df(txt_file_list, case_info_list)
+    case_errors = pd.DataFrame({'file_name': error_file_list,
+                                'file_path': error_path_list,
+                                'case_error': error_list})
+    
+    return((appeals, case_errors))
+
+
+# Columns of the data frame of case info.
+# Fields with lists are spread over a fixed number of columns. 
+CASE_DF_COLUMNS = ['file_name', 'case_code', 'circ_num', 'circ_code', 
+                   'pla_appnt_1', 'pla_appnt_2', 'pla_appnt_3', 
+                   'def_appee_1', 'def_appee_2', 'def_appee_3', 'def_appee_4',
+                   'case_num', 'case_num_list', 'num_case_nums', 
+                   'case_num_1', 'case_num_2', 'case_num_3',
+                   'case_date_1', 'case_date_2', 'case_date_3', 'case_date_4', 
+                   'background', 
+                   'holdings_hdr', 'outcome', 'posture', 
+                   'judicial_panel', 'judge_names', 'num_judges', 
+                   'judge_1', 'judge_2', 'judge_3', 'judge_4']
+
+
+# Append the first num_cols elements of a list to separate columns, 
+# with "NA" for missing elements.
+def append_case_list_cols(case_cols, col_prefix, case_list, num_cols):
+    
+    for col_num in range(num_cols):
+        col_name = col_prefix + str(col_num + 1)
+        if col_num < len(case_list):
+            case_cols[col_name].append(case_list[col_num])
+        else:
+            case_cols[col_name].append("NA")
+
+
+# Get data frame from list of dictionaries of case info.
+def get_case_info_df(txt_file_list, case_info_list):
+    
+    # Collect the fields in a list for each column
+    # and create the data frame once, at the end.
+    case_cols = {}
+    for col_name in CASE_DF_COLUMNS:
+        case_cols[col_name] = []
+    
+    for txt_file_num in range(len(txt_file_list)):
+        
+        # Read the information from this case.
+        txt_file_name = os.path.split(txt_file_list[txt_file_num])[1]
+        case_info = case_info_list[txt_file_num]
         
         
-        # Enter the fields into the data frame.
-        appeals['file_name'][txt_file_num] = txt_file_name
-        appeals['case_code'][txt_file_num] = case_info["case_code"]
-        appeals['circ_num'][txt_file_num] = case_info["circ_num"]
+        # Enter the fields into the columns.
+        case_cols['file_name'].append(txt_file_name)
+        case_cols['case_code'].append(case_info["case_code"])
+        case_cols['circ_num'].append(case_info["circ_num"])
+        case_cols['circ_code'].append(get_circ_code(case_info["circ_num"]))
         
         # Record the names of parties.
         # Plaintiff-Appellant:
-        for party_num in range(3):
-            party_var_name = "pla_appnt_" + str(party_num + 1)
-            if party_num < len(case_info["pla_appnt"]):
-                appeals[party_var_name][txt_file_num] = case_info["pla_appnt"][party_num]
-            else:
-                appeals[party_var_name][txt_file_num] = "NA"
+        append_case_list_cols(case_cols, "pla_appnt_", case_info["pla_appnt"], 3)
         # Defendant-Appellee:
-        for party_num in range(4):
-            party_var_name = "def_appee_" + str(party_num + 1)
-            if party_num < len(case_info["def_appee"]):
-                appeals[party_var_name][txt_file_num] = case_info["def_appee"][party_num]
-            else:
-                appeals[party_var_name][txt_file_num] = "NA"
+        append_case_list_cols(case_cols, "def_appee_", case_info["def_appee"], 4)
         
         # There may be multiple case numbers for related cases. 
-        appeals['case_num'][txt_file_num] = case_info["case_num"]
-        appeals['case_num_list'][txt_file_num] = case_info["case_num_list"]
-        appeals['num_case_nums'][txt_file_num] = len(case_info["case_num_list"])
+        case_cols['case_num'].append(case_info["case_num"])
+        case_cols['case_num_list'].append(case_info["case_num_list"])
+        case_cols['num_case_nums'].append(len(case_info["case_num_list"]))
         # Case numbers are collected in a list.
-        for case_num_num in range(3):
-            case_num_var_name = "case_num_" + str(case_num_num + 1)
-            if case_num_num < len(case_info["case_num_list"]):
-                appeals[case_num_var_name][txt_file_num] = case_info["case_num_list"][case_num_num]
-            else:
-                appeals[case_num_var_name][txt_file_num] = "NA"
-        
-        
+        append_case_list_cols(case_cols, "case_num_", case_info["case_num_list"], 3)
         
         # Dates are collected in a list.
-        for date_num in range(4):
-            date_var_name = "case_date_" + str(date_num + 1)
-            if date_num < len(case_info["case_date"]):
-                appeals[date_var_name][txt_file_num] = case_info["case_date"][date_num]
-            else:
-                appeals[date_var_name][txt_file_num] = "NA"
+        append_case_list_cols(case_cols, "case_date_", case_info["case_date"], 4)
         
         
-        appeals['background'][txt_file_num] = case_info["background"]
+        case_cols['background'].append(case_info["background"])
         
-        appeals['holdings_hdr'][txt_file_num] = case_info["holdings_hdr"]
-        appeals['outcome'][txt_file_num] = case_info["outcome"]
-        appeals['posture'][txt_file_num] = case_info["posture"]
+        case_cols['holdings_hdr'].append(case_info["holdings_hdr"])
+        case_cols['outcome'].append(case_info["outcome"])
+        case_cols['posture'].append(case_info["posture"])
         
         # Colect names of *hopefully three* judges (last column should be blank).
-        appeals['judicial_panel'][txt_file_num] = case_info["judicial_panel"]
-        appeals['judge_names'][txt_file_num] = case_info["judge_names"]
-        appeals['num_judges'][txt_file_num] = len(case_info["judge_names"])
+        case_cols['judicial_panel'].append(case_info["judicial_panel"])
+        case_cols['judge_names'].append(case_info["judge_names"])
+        case_cols['num_judges'].append(len(case_info["judge_names"]))
         # Record the names of the judges in separate fields.
-        for judge_num in range(4):
-            judge_var_name = "judge_" + str(judge_num + 1)
-            if judge_num < len(case_info["judge_names"]):
-                appeals[judge_var_name][txt_file_num] = case_info["judge_names"][judge_num]
-            else:
-                appeals[judge_var_name][txt_file_num] = "NA"
-        
+        append_case_list_cols(case_cols, "judge_", case_info["judge_names"], 4)
+    
+    # Keep the object columns of the previous cell-by-cell version.
+    appeals = pd.DataFrame(case_cols, columns = CASE_DF_COLUMNS, 
+                           index = range(len(txt_file_list)), dtype = object)
+    # Circuit codes are categorical, missing where no circuit is named.
+    appeals['circ_code'] = appeals['circ_code'].astype(CIRC_CODE_DTYPE)
+    
     return(appeals)
 
 
 
+# Fields of the case info that are lists of varying length, 
+# with the prefix and number of columns for the elements in the data frame.
+CASE_LIST_FIELDS = {'pla_appnt': ('pla_appnt_', 3), 
+                    'def_appee': ('def_appee_', 4), 
+                    'case_num_list': ('case_num_', 3), 
+                    'case_date': ('case_date_', 4), 
+                    'judge_names': ('judge_', 4)}
+
+# Fields of the case info with one string.
+CASE_STR_FIELDS = ['case_code', 'circ_num', 'case_num', 'background', 
+                   'holdings_hdr', 'outcome', 'posture', 'judicial_panel']
+
+
+# Get compact records of case info from list of dictionaries of case info.
+def get_case_records(txt_file_list, case_info_list):
+    
+    # Each field is stored as a categorical, with sorted categories, 
+    # so that repeated strings (circuits, judges, outcomes, parties)
+    # are stored once, with an integer code for each case.
+    # A list field is stored as the tuple (values, offsets), 
+    # with the elements of all the lists in one categorical:
+    # the list for case i is values[offsets[i]:offsets[i + 1]].
+    # Examples:
+    # case_records = get_case_records(txt_file_list, case_info_list)
+    # appeals = get_case_record_df(case_records)
+    
+    case_records = {"file_name": np.array([os.path.split(txt_file)[1] for txt_file in txt_file_list], 
+                                          dtype = object)}
+    
+    for field in CASE_STR_FIELDS:
+        case_records[field] = pd.Categorical([case_info[field] for case_info in case_info_list])
+    
+    for field in CASE_LIST_FIELDS:
+        list_lens = np.fromiter((len(case_info[field]) for case_info in case_info_list), 
+                                dtype = np.int64, count = len(case_info_list))
+        offsets = np.zeros(len(case_info_list) + 1, dtype = np.int64)
+        np.cumsum(list_lens, out = offsets[1:])
+        element_list = [element for case_info in case_info_list for element in case_info[field]]
+        values = pd.Categorical(element_list, categories = sorted(set(element_list) | {"NA"}))
+        case_records[field] = (values, offsets)
+    
+    return(case_records)
+
+
+# Get the dictionary of case info for one case from the compact records.
+def get_case_record(case_records, case_num):
+    
+    case_info = {"file_name": case_records['file_name'][case_num]}
+    for field in CASE_STR_FIELDS:
+        case_info[field] = case_records[field][case_num]
+    for field in CASE_LIST_FIELDS:
+        (values, offsets) = case_records[field]
+        case_info[field] = list(values[offsets[case_num]:offsets[case_num + 1]])
+    
+    return(case_info)
+
+
+# Get the element col_num of each list in a list field, as a categorical, 
+# with "NA" for lists that are too short.
+def get_case_list_col(values, offsets, col_num):
+    
+    # The categories of the values include "NA".
+    list_starts = offsets[0:-1] + col_num
+    has_element = list_starts < offsets[1:]
+    codes = np.full(len(list_starts), values.categories.get_loc("NA"), dtype = np.int64)
+    codes[has_element] = values.codes[list_starts[has_element]]
+    
+    return(pd.Categorical.from_codes(codes, values.categories))
+
+
+# Get data frame with categorical columns from the compact records.
+def get_case_record_df(case_records):
+    
+    # The data frame has the columns CASE_DF_COLUMNS, 
+    # as from get_case_info_df(), but the strings are categoricals 
+    # and the counts are integers.
+    # The lists in case_num_list and judge_names share the strings of the categoricals.
+    case_cols = {"file_name": case_records['file_name']}
+    for field in CASE_STR_FIELDS:
+        case_cols[field] = case_records[field]
+    case_cols['circ_code'] = get_circ_code_vec(pd.Series(case_records['circ_num'])).values
+    
+    for (field, (col_prefix, num_cols)) in CASE_LIST_FIELDS.items():
+        (values, offsets) = case_records[field]
+        for col_num in range(num_cols):
+            case_cols[col_prefix + str(col_num + 1)] = get_case_list_col(values, offsets, col_num)
+    
+    # Keep the full lists for case numbers and judges.
+    for (field, num_field) in [('case_num_list', 'num_case_nums'), ('judge_names', 'num_judges')]:
+        (values, offsets) = case_records[field]
+        element_list = np.asarray(values.categories, dtype = object)[values.codes].tolist()
+        case_cols[field] = [element_list[offsets[case_num]:offsets[case_num + 1]] 
+                            for case_num in range(len(offsets) - 1)]
+        case_cols[num_field] = np.diff(offsets)
+    
+    appeals = pd.DataFrame(case_cols, columns = CASE_DF_COLUMNS)
+    
+    return(appeals)
+
+
+# Collect a stream of case info into data frames of at most chunksize cases.
+def iter_case_df_chunks(case_info_iter, chunksize = 1000):
+    
+    # Examples:
+    # for appeals_sub in iter_case_df_chunks(iter_cases(txt_path)):
+    #     appeals_list.append(appeals_sub)
+    
+    file_name_list = []
+    case_info_list = []
+    for case_info in case_info_iter:
+        file_name_list.append(case_info['file_name'])
+        case_info_list.append(case_info)
+        if len(case_info_list) == chunksize:
+            yield get_case_info_df(file_name_list, case_info_list)
+            file_name_list = []
+            case_info_list = []
+    
+    if len(case_info_list) > 0:
+        yield get_case_info_df(file_name_list, case_info_list)
+
+
+# Combine data frames, by year or by chunk, into one data frame.
+def combine_case_dfs(appeals_list, columns = CASE_DF_COLUMNS):
+    
+    # The data frames are combined once, at the end, 
+    # rather than appending each in turn, which copies the full data frame.
+    # The index is replaced with a clean range of row numbers.
+    appeals_list = list(appeals_list)
+    if len(appeals_list) == 0:
+        return(pd.DataFrame(columns = columns))
+    
+    # Categorical columns, as from get_case_record_df(), 
+    # remain categorical with the union of the categories.
+    # Columns that share a fixed set of categories, such as circ_code, keep them.
+    for col_name in appeals_list[0].columns:
+        if all(appeals_sub[col_name].dtype == appeals_list[0][col_name].dtype 
+               for appeals_sub in appeals_list):
+            continue
+        if all(isinstance(appeals_sub[col_name].dtype, pd.CategoricalDtype) 
+               for appeals_sub in appeals_list):
+            col_dtype = pd.CategoricalDtype(pd.api.types.union_categoricals(
+                [appeals_sub[col_name] for appeals_sub in appeals_list], 
+                sort_categories = True).categories)
+            appeals_list = [appeals_sub.astype({col_name: col_dtype}) for appeals_sub in appeals_list]
+    
+    appeals = pd.concat(appeals_list, ignore_index = True)
+    
+    return(appeals)
+
+
+# Create a master table of judges, 
+# counting the appearances of each judge in each circuit.
+def get_judge_list(appeals, num_judges = 3):
+    
+    # Stack the first num_judges judges' names 
+    # from the valid judicial panels. 
+    # Judges are grouped by circuit code, 
+    # and circ_num holds the full name of each circuit.
+    is_valid = is_panel_vec(appeals['judicial_panel']).values
+    if 'circ_code' in appeals.columns:
+        circ_codes = appeals['circ_code'].astype(CIRC_CODE_DTYPE)
+    else:
+        circ_codes = get_circ_code_vec(appeals['circ_num'])
+    judge_list_cols = ['circ_code', 'judge_name']
+    judge_list_subs = []
+    for judge_num in range(num_judges):
+        judge_var_name = "judge_" + str(judge_num + 1)
+        judge_list_sub = pd.DataFrame({'circ_code': circ_codes.values[is_valid], 
+                                       'judge_name': appeals[judge_var_name].values[is_valid]})
+        judge_list_subs.append(judge_list_sub)
+    judge_list = combine_case_dfs(judge_list_subs, columns = judge_list_cols)
+    
+    # Preserve number of appearances with a group_by.
+    judge_list['num'] = 1
+    # Panels with headers that do not name a circuit are kept, 
+    # with a missing circuit code. 
+    judge_list = judge_list.groupby(['circ_code','judge_name'], as_index = False, 
+                                    observed = True, dropna = False).sum()
+    judge_list.sort_values(by=['circ_code','judge_name'], inplace = True)
+    judge_list.insert(1, 'circ_num', 
+                      judge_list['circ_code'].cat.rename_categories(CIRC_NAMES))
+    
+    return(judge_list)
+
+
+
 # Count the valid observations
 def count_valid_obsns(appeals):
     
-    valid_counts = pd.DataFrame(columns = ['file_name', 'case_code', 'circ_num', 
-                                      # 'pla_appnt_1', 'pla_appnt_2', 'pla_appnt_3', 
-                                      # 'def_appee_1', 'def_appee_2', 'def_appee_3', 'def_appee_4',
-                                      'case_num', 
-                                      # 'case_date_1', 'case_date_2', 'case_date_3', 'case_date_4', 
-                                      'background', 
-                                      'holdings_hdr', 'outcome', 'posture', 'judicial_panel'], 
-                           index = appeals.index)
-    
-    valid_counts['file_name'] = appeals['file_name']
-    valid_counts['case_code'] = is_case_code_vec(appeals['case_code'])
-    # valid_counts['case_code'] = is_case_code_vec(appeals.ix[:, 'case_code'])
-    valid_counts['circ_num'] = is_circ_num_vec(appeals['circ_num'])
-    valid_counts['case_num'] = is_case_num_vec(appeals['case_num'])
-    valid_counts['background'] = is_background_vec(appeals['background'])
-    valid_counts['holdings_hdr'] = is_holdings_hdr_vec(appeals['holdings_hdr'])
-    valid_counts['outcome'] = is_outcome_vec(appeals['outcome'])
-    valid_counts['posture'] = is_posture_vec(appeals['posture'])
-    valid_counts['judicial_panel'] = is_panel_vec(appeals['judicial_panel'])
-
+    # The data frame is built at once from the boolean series 
+    # returned by the validators, one column for each field. 
+    # Fields not validated: 
+    # 'pla_appnt_1', 'pla_appnt_2', 'pla_appnt_3', 
+    # 'def_appee_1', 'def_appee_2', 'def_appee_3', 'def_appee_4',
+    # 'case_date_1', 'case_date_2', 'case_date_3', 'case_date_4'
+    valid_counts = pd.DataFrame({'file_name': appeals['file_name'], 
+                                 'case_code': is_case_code_vec(appeals['case_code']), 
+                                 'circ_num': is_circ_num_vec(appeals['circ_num']), 
+                                 'case_num': is_case_num_vec(appeals['case_num']), 
+                                 'background': is_background_vec(appeals['background']), 
+                                 'holdings_hdr': is_holdings_hdr_vec(appeals['holdings_hdr']), 
+                                 'outcome': is_outcome_vec(appeals['outcome']), 
+                                 'posture': is_posture_vec(appeals['posture']), 
+                                 'judicial_panel': is_panel_vec(appeals['judicial_panel'])}, 
+                                index = appeals.index)
     
     return(valid_counts)
 
+
+# Get the year of each case from the latest year in the case dates.
+def get_case_year_vec(appeals, num_dates = 4):
+    
+    # Returns a series of years, with missing values
+    # for cases without a year in the dates. 
+    year_cols = []
+    for date_num in range(num_dates):
+        date_col = get_str_col(appeals['case_date_' + str(date_num + 1)])
+        year_col = date_col.extract(r'\b((?:18|19|20)\d\d)\b', expand = False)
+        year_cols.append(pd.to_numeric(year_col))
+    case_year = pd.concat(year_cols, axis = 1).max(axis = 1).astype('Int64')
+    
+    return(case_year)
+
+
+# Get a report of the valid observations in each field, 
+# overall, by circuit and by year, with a sample of the invalid values.
+def get_valid_report(appeals, sample_size = 10, seed = 42):
+    
+    # Each field is tested once, for the full column.
+    # The sample of invalid values holds at most sample_size rows for each field, 
+    # chosen at random without replacement, with a fixed seed 
+    # so that reports compare across changes to the parser. 
+    # Examples:
+    # valid_report = get_valid_report(appeals)
+    # print_valid_report(valid_report)
+    # valid_report['invalid_sample'][valid_report['invalid_sample']['field'] == 'posture']
+    
+    valid_counts = count_valid_obsns(appeals)
+    field_list = [field for field in valid_counts.columns if field != 'file_name']
+    valid_cols = valid_counts[field_list]
+    num_obsns = len(valid_cols)
+    
+    # Counts and rates for each field. 
+    field_counts = pd.DataFrame({'num_valid': valid_cols.sum(), 
+                                 'num_invalid': num_obsns - valid_cols.sum(), 
+                                 'valid_rate': valid_cols.mean()})
+    field_counts.index.name = 'field'
+    
+    # Rates for each field by circuit code and by year, 
+    # so that the variants of the header for a circuit are counted together. 
+    if 'circ_code' in appeals.columns:
+        circ_codes = appeals['circ_code'].astype(CIRC_CODE_DTYPE)
+    else:
+        circ_codes = get_circ_code_vec(appeals['circ_num'])
+    circ_groups = valid_cols.groupby(circ_codes.rename('circ_code'), dropna = False, 
+                                     observed = True)
+    circ_rates = circ_groups.mean()
+    circ_rates.insert(0, 'num_obsns', circ_groups.size())
+    case_year = get_case_year_vec(appeals)
+    year_rates = valid_cols.groupby(case_year.rename('case_year'), dropna = False).mean()
+    year_rates.insert(0, 'num_obsns', valid_cols.groupby(case_year.rename('case_year'), 
+                                                         dropna = False).size())
+    
+    # Sample of the invalid values for each field.
+    rng = np.random.default_rng(seed)
+    sample_list = []
+    for field in field_list:
+        # Rows are taken by position, since the index may have duplicates, 
+        # as when yearly data frames are concatenated.
+        invalid_pos = np.flatnonzero(~valid_cols[field].values)
+        if len(invalid_pos) > sample_size:
+            sample_nums = np.sort(rng.choice(len(invalid_pos), size = sample_size, replace = False))
+            invalid_pos = invalid_pos[sample_nums]
+        sample_list.append(pd.DataFrame({'field': field, 
+                                         'file_name': appeals['file_name'].iloc[invalid_pos].values, 
+                                         'value': appeals[field].iloc[invalid_pos].values}, 
+                                        index = appeals.index[invalid_pos]))
+    invalid_sample = pd.concat(sample_list)
+    
+    valid_report = {"num_obsns": num_obsns, 
+                    "field_counts": field_counts, 
+                    "circ_rates": circ_rates, 
+                    "year_rates": year_rates, 
+                    "invalid_sample": invalid_sample}
+    
+    return(valid_report)
+
+
+# Print the report of the valid observations.
+def print_valid_report(valid_report):
+    
+    print("num_obsns = ")
+    print(valid_report["num_obsns"])
+    
+    print("field_counts = ")
+    print(valid_report["field_counts"])
+    
+    print("circ_rates = ")
+    print(valid_report["circ_rates"])
+    
+    print("year_rates = ")
+    print(valid_report["year_rates"])
+    
+    print("invalid_sample = ")
+    print(valid_report["invalid_sample"])
+
+##################################################
+# Define functions for storing case info.
+##################################################
+
+# The data frame of case info and the list of judges are stored 
+# as Parquet datasets, with a directory for each circuit (and year), 
+# so that one circuit or year is read without reading the rest.
+# String columns are stored with dictionary encoding 
+# and case_num_list and judge_names as list columns.
+# These functions require pyarrow, which is imported only when they are called.
+
+# Partition columns of the stored data frames.
+CASE_PARQUET_PARTITIONS = ['circ_code', 'case_year']
+JUDGE_PARQUET_PARTITIONS = ['circ_code']
+
+# Types of the partition columns, since codes such as '10' 
+# would otherwise be read as numbers.
+PARQUET_PART_TYPES = {'circ_code': 'string', 'case_year': 'int32'}
+
+# Columns of case info that are not stored as strings.
+CASE_PARQUET_LIST_COLS = ['case_num_list', 'judge_names']
+CASE_PARQUET_INT_COLS = ['num_case_nums', 'num_judges', 'case_year']
+
+
+# Get data frame of case info ready to store, 
+# with categorical string columns and the year of the case.
+def get_case_parquet_df(appeals):
+    
+    if 'case_year' not in appeals.columns:
+        appeals = appeals.assign(case_year = get_case_year_vec(appeals))
+    col_types = {}
+    for col_name in appeals.columns:
+        if col_name in CASE_PARQUET_INT_COLS:
+            col_types[col_name] = 'Int64'
+        elif col_name not in CASE_PARQUET_LIST_COLS:
+            col_types[col_name] = 'category'
+    
+    return(appeals.astype(col_types))
+
+
+# Write a data frame to a Parquet dataset, partitioned by the columns part_cols.
+def write_parquet_dataset(df, parquet_path, part_cols):
+    
+    # Partitions that are in the data frame replace those already stored, 
+    # and the others are kept, so years can be written one at a time.
+    df.to_parquet(parquet_path, partition_cols = part_cols, index = False, 
+                  existing_data_behavior = 'delete_matching')
+
+
+# Read a Parquet dataset, keeping only the partitions 
+# with the values, or lists of values, in part_values. 
+def read_parquet_dataset(parquet_path, part_values, columns = None):
+    
+    # Only the directories for the selected partitions are read, 
+    # and only the requested columns within them.
+    import pyarrow
+    import pyarrow.dataset
+    
+    part_schema = pyarrow.schema([(col_name, pyarrow.type_for_alias(PARQUET_PART_TYPES[col_name])) 
+                                  for col_name in part_values])
+    part_format = pyarrow.dataset.partitioning(part_schema, flavor = 'hive')
+    dataset = pyarrow.dataset.dataset(parquet_path, format = 'parquet', 
+                                      partitioning = part_format)
+    row_filter = None
+    for (col_name, col_value) in part_values.items():
+        if col_value is None:
+            continue
+        if isinstance(col_value, (list, tuple, set)):
+            col_filter = pyarrow.dataset.field(col_name).isin(list(col_value))
+        else:
+            col_filter = pyarrow.dataset.field(col_name) == col_value
+        if row_filter is None:
+            row_filter = col_filter
+        else:
+            row_filter = row_filter & col_filter
+    
+    df = dataset.to_table(columns = columns, filter = row_filter).to_pandas()
+    
+    return(df)
+
+
+# Store the data frame of case info, partitioned by circuit and year.
+def write_case_parquet(appeals, parquet_path):
+    
+    # Examples:
+    # write_case_parquet(appeals, data_path + 'appeals_parquet')
+    
+    write_parquet_dataset(get_case_parquet_df(appeals), parquet_path, 
+                          CASE_PARQUET_PARTITIONS)
+
+
+# Get the circuit codes for a circuit, or a list of circuits, 
+# given by name or by code.
+def get_circ_code_arg(circ_num):
+    
+    # Examples:
+    # get_circ_code_arg('Tenth Circuit')
+    # '10'
+    # get_circ_code_arg(['DC', 'Federal Circuit'])
+    # ['DC', 'FED']
+    
+    if circ_num is None:
+        return(None)
+    if isinstance(circ_num, (list, tuple, set)):
+        return([get_circ_code_arg(circ) for circ in circ_num])
+    
+    return(circ_num if circ_num in CIRC_CODES else get_circ_code(circ_num))
+
+
+# Read the stored data frame of case info, for selected circuits and years.
+def read_case_parquet(parquet_path, circ_num = None, case_year = None, columns = None):
+    
+    # The rows are grouped by circuit and year, 
+    # with the columns in the order of CASE_DF_COLUMNS, then case_year.
+    # Examples:
+    # appeals = read_case_parquet(data_path + 'appeals_parquet', 'Tenth Circuit', 2005)
+    # appeals = read_case_parquet(data_path + 'appeals_parquet', 
+    #                             case_year = [2004, 2005], columns = ['circ_num', 'judge_names'])
+    
+    appeals = read_parquet_dataset(parquet_path, 
+                                   {'circ_code': get_circ_code_arg(circ_num), 
+                                    'case_year': case_year}, 
+                                   columns)
+    
+    # Restore the lists, the types of the partitions and the order of the columns.
+    for col_name in CASE_PARQUET_LIST_COLS:
+        if col_name in appeals.columns:
+            appeals[col_name] = [list(col_list) for col_list in appeals[col_name]]
+    if 'circ_code' in appeals.columns:
+        appeals['circ_code'] = appeals['circ_code'].astype(object).astype(CIRC_CODE_DTYPE)
+    if 'case_year' in appeals.columns:
+        appeals['case_year'] = appeals['case_year'].astype('Int64')
+    col_order = [col_name for col_name in CASE_DF_COLUMNS + ['case_year'] 
+                 if col_name in appeals.columns]
+    
+    return(appeals[col_order])
+
+
+# Store the list of judges, partitioned by circuit.
+def write_judge_parquet(judge_list, parquet_path):
+    
+    # Examples:
+    # write_judge_parquet(judge_list, data_path + 'judge_list_parquet')
+    
+    judge_list = judge_list.astype({'circ_code': CIRC_CODE_DTYPE, 'circ_num': 'category', 
+                                    'judge_name': 'category'})
+    write_parquet_dataset(judge_list, parquet_path, JUDGE_PARQUET_PARTITIONS)
+
+
+# Read the stored list of judges, for selected circuits.
+def read_judge_parquet(parquet_path, circ_num = None, columns = None):
+    
+    # Examples:
+    # judge_list = read_judge_parquet(data_path + 'judge_list_parquet', ['1', 'Tenth Circuit'])
+    
+    judge_list = read_parquet_dataset(parquet_path, {'circ_code': get_circ_code_arg(circ_num)}, 
+                                      columns)
+    judge_list = judge_list.astype({col_name: 'category' for col_name in ['circ_num', 'judge_name'] 
+                                    if col_name in judge_list.columns})
+    if 'circ_code' in judge_list.columns:
+        judge_list['circ_code'] = judge_list['circ_code'].astype(object).astype(CIRC_CODE_DTYPE)
+    col_order = [col_name for col_name in ['circ_code', 'circ_num', 'judge_name', 'num'] 
+                 if col_name in judge_list.columns]
+    
+    return(judge_list[col_order])
+
+##################################################
+# Define functions for linking judges to FJC records.
+##################################################
+
+# The judges named on the panels are linked to the records 
+# in judge_data/FJC_app_judge_list.csv, the appointments of judges 
+# to the U.S. Courts of Appeals from the Federal Judicial Center (FJC), 
+# which are identified by the FJC node ID, nid.
+# Names are looked up in an index by circuit and last name, 
+# keeping the judges who served in the year of the case. 
+# Only if a name is not in the index, it is compared with the names
+# of the judges in the same circuit and year.
+
+# The circuits in the FJC list are recorded with the codes in CIRC_CODES.
+
+# Number of appointments to the Courts of Appeals in the FJC list.
+FJC_NUM_APPS = 4
+
+# Suffixes that are not part of a last name.
+JUDGE_NAME_SUFFIXES = ['JR', 'SR', 'II', 'III', 'IV']
+
+# Minimum similarity of names for the comparison with names in the same circuit. 
+JUDGE_NAME_CUTOFF = 0.8
+
+
+# Get the key for matching a name: the upper-case letters, without accents.
+def get_name_key(name):
+    
+    # Examples:
+    # get_name_key("O'Scannlain")
+    # 'OSCANNLAIN'
+    
+    name = unicodedata.normalize('NFKD', name).encode('ascii', 'ignore').decode('ascii')
+    
+    return(re.sub(r'[^A-Z]', '', name.upper()))
+
+
+# Get the possible keys for the last name in a judge's name from a panel.
+def get_judge_name_keys(judge_name):
+    
+    # The last name is one of the last three words, joined, 
+    # after dropping initials and suffixes, longest first.
+    # Examples:
+    # get_judge_name_keys('A  WALLACE TASHIMA')
+    # ['WALLACETASHIMA', 'TASHIMA']
+    # get_judge_name_keys('J. W. MERRITT')
+    # ['MERRITT']
+    # get_judge_name_keys('VAN DUSEN')
+    # ['VANDUSEN', 'DUSEN']
+    
+    word_list = [get_name_key(word) for word in str(judge_name).split()]
+    word_list = [word for word in word_list 
+                 if len(word) > 1 and word not in JUDGE_NAME_SUFFIXES]
+    word_list = word_list[-3:]
+    
+    return([''.join(word_list[word_num:]) for word_num in range(len(word_list))])
+
+
+# Get the initials of the first and middle names in a judge's name from a panel.
+def get_judge_initials(judge_name):
+    
+    # Examples:
+    # get_judge_initials('J. W. MERRITT')
+    # ['J', 'W']
+    
+    word_list = [get_name_key(word) for word in str(judge_name).split()]
+    
+    return([word[0] for word in word_list[0:-1] if len(word) > 0])
+
+
+# Read the FJC list of judges on the Courts of Appeals.
+def read_fjc_judges(fjc_file):
+    
+    # Examples:
+    # fjc_judges = read_fjc_judges('../judge_data/FJC_app_judge_list.csv')
+    
+    fjc_judges = pd.read_csv(fjc_file, dtype = str, keep_default_na = False)
+    
+    return(fjc_judges)
+
+
+# Build the index of judges by circuit and last name, from the FJC list.
+def get_judge_index(fjc_judges):
+    
+    # Each appointment is recorded as the tuple 
+    # (nid, name key, first initial, first year, last year), 
+    # with no last year for judges still serving.
+    # "names" indexes the appointments by (circuit, name key) 
+    # and "circuits" lists the appointments in each circuit.
+    # Examples:
+    # judge_index = get_judge_index(read_fjc_judges(fjc_file))
+    # resolve_judge_nid(judge_index, 'Tenth Circuit', 'LUCERO', 2005)
+    
+    judge_index = {"names": {}, "circuits": {}}
+    for judge_row in fjc_judges.to_dict('records'):
+        name_key = get_name_key(judge_row['Last.Name'])
+        first_initial = get_name_key(judge_row['First.Name'])[0:1]
+        for app_num in range(1, FJC_NUM_APPS + 1):
+            circ = judge_row['app_' + str(app_num) + '_circ'].strip()
+            if circ == '':
+                continue
+            beg_yr = judge_row['app_' + str(app_num) + '_beg_yr'].strip()
+            end_yr = judge_row['app_' + str(app_num) + '_end_yr'].strip()
+            judge_app = (int(judge_row['nid']), name_key, first_initial, 
+                         int(float(beg_yr)) if beg_yr != '' else None, 
+                         int(float(end_yr)) if end_yr != '' else None)
+            judge_index['names'].setdefault((circ, name_key), []).append(judge_app)
+            judge_index['circuits'].setdefault(circ, []).append(judge_app)
+    
+    return(judge_index)
+
+
+# Keep the appointments that include the year of the case, if any.
+def filter_judge_apps(judge_apps, case_year):
+    
+    if case_year is None or pd.isna(case_year):
+        return(judge_apps)
+    
+    return([judge_app for judge_app in judge_apps 
+            if (judge_app[3] is None or judge_app[3] <= case_year) 
+            and (judge_app[4] is None or case_year <= judge_app[4])])
+
+
+# Choose the one judge among the appointments, if there is only one.
+def choose_judge_nid(judge_apps, judge_name):
+    
+    # With more than one judge, use the initials in the name, if any.
+    nid_set = {judge_app[0] for judge_app in judge_apps}
+    if len(nid_set) > 1:
+        initials = get_judge_initials(judge_name)
+        nid_set = {judge_app[0] for judge_app in judge_apps if judge_app[2] in initials}
+    if len(nid_set) == 1:
+        return(nid_set.pop())
+    
+    return(None)
+
+
+# Get the FJC nid of a judge named on a panel in a circuit and year.
+def resolve_judge_nid(judge_index, circ_num, judge_name, case_year = None):
+    
+    # Returns None if no single judge matches.
+    # Examples:
+    # resolve_judge_nid(judge_index, 'Tenth Circuit', 'LUCERO', 2005)
+    # 1384091
+    # resolve_judge_nid(judge_index, 'Tenth Circuit', 'UCERO', 2005)
+    # 1384091
+    # resolve_judge_nid(judge_index, '10', 'LUCERO', 2005)
+    # 1384091
+    
+    circ = circ_num if circ_num in CIRC_CODES else get_circ_code(circ_num)
+    name_keys = get_judge_name_keys(judge_name)
+    
+    # Look up each possible last name in the index.
+    for name_key in name_keys:
+        judge_apps = filter_judge_apps(judge_index['names'].get((circ, name_key), []), 
+                                       case_year)
+        if len(judge_apps) > 0:
+            return(choose_judge_nid(judge_apps, judge_name))
+    
+    # Otherwise, compare the last word with the names 
+    # of the judges in the same circuit and year.
+    if len(name_keys) == 0:
+        return(None)
+    judge_apps = filter_judge_apps(judge_index['circuits'].get(circ, []), case_year)
+    close_keys = difflib.get_close_matches(name_keys[-1], 
+                                           {judge_app[1] for judge_app in judge_apps}, 
+                                           n = 1, cutoff = JUDGE_NAME_CUTOFF)
+    if len(close_keys) == 0:
+        return(None)
+    judge_apps = [judge_app for judge_app in judge_apps if judge_app[1] == close_keys[0]]
+    
+    return(choose_judge_nid(judge_apps, judge_name))
+
+
+# Get the FJC nids of the judges on the panels, in columns judge_nid_1, judge_nid_2, ...
+def get_judge_nid_df(appeals, judge_index, num_judges = 4):
+    
+    # Each distinct (circuit, judge, year) is resolved once, 
+    # then matched back to the cases. 
+    # The year is case_year, if in the data frame, or else from the dates.
+    # Examples:
+    # judge_nids = get_judge_nid_df(appeals, judge_index)
+    # appeals = pd.concat([appeals, judge_nids], axis = 1)
+    
+    if 'case_year' in appeals.columns:
+        case_year = appeals['case_year'].astype('Int64')
+    else:
+        case_year = get_case_year_vec(appeals)
+    year_list = [None if pd.isna(year) else int(year) for year in case_year]
+    if 'circ_code' in appeals.columns:
+        circ_codes = appeals['circ_code'].astype(object).fillna("NA")
+    else:
+        circ_codes = get_circ_code_vec(appeals['circ_num']).astype(object).fillna("NA")
+    
+    judge_keys = []
+    for judge_num in range(num_judges):
+        judge_keys.append(pd.DataFrame({'circ_code': circ_codes.values, 
+                                        'judge_name': appeals['judge_' + str(judge_num + 1)].astype(object).values, 
+                                        'case_year': pd.Series(year_list, dtype = object).values}))
+    unique_keys = pd.concat(judge_keys, ignore_index = True).drop_duplicates()
+    unique_keys = unique_keys[unique_keys['judge_name'] != "NA"]
+    nid_dict = {}
+    for (circ_code, judge_name, year) in unique_keys.itertuples(index = False, name = None):
+        nid_dict[(circ_code, judge_name, year)] = resolve_judge_nid(judge_index, circ_code, 
+                                                                   judge_name, year)
+    
+    judge_nids = pd.DataFrame(index = appeals.index)
+    for judge_num in range(num_judges):
+        key_df = judge_keys[judge_num]
+        nid_list = [nid_dict.get(judge_key) for judge_key in key_df.itertuples(index = False, name = None)]
+        judge_nids['judge_nid_' + str(judge_num + 1)] = pd.array(nid_list, dtype = 'Int64')
+    
+    return(judge_nids)
+
+
 ##################################################
 # End
 ##################################################